@@ -157,16 +157,16 @@ function renderVendorsGrid(vendors) {
                 
                 <!-- Faved and Save Counters -->
                 <div class="d-flex gap-2 mt-2 pt-2 border-top">
-                  <button class="btn btn-outline-warning btn-sm vendor-like-btn" 
+                  <button class="btn ${vendor.liked ? 'btn-warning' : 'btn-outline-warning'} btn-sm vendor-like-btn" 
                           data-vendor-id="${vendor.id}" 
                           title="Fave this food truck">
-                    <i class="bi bi-star me-1"></i>
+                    <i class="bi ${vendor.liked ? 'bi-star-fill' : 'bi-star'} me-1"></i>
                     <span class="like-count">${vendor.like_count || 0}</span>
                   </button>
-                  <button class="btn btn-outline-primary btn-sm vendor-save-btn" 
+                  <button class="btn ${vendor.saved ? 'btn-primary' : 'btn-outline-primary'} btn-sm vendor-save-btn" 
                           data-vendor-id="${vendor.id}" 
                           title="Save this food truck">
-                    <i class="bi bi-bookmark me-1"></i>
+                    <i class="bi ${vendor.saved ? 'bi-bookmark-fill' : 'bi-bookmark'} me-1"></i>
                     <span class="save-count">${vendor.save_count || 0}</span>
                   </button>
                 </div>
@@ -379,16 +379,16 @@ grid.innerHTML = filteredReels.map((r, index) => `
           </div>
         </div>
         <div class="d-flex gap-2">
-          <button class="btn btn-outline-danger btn-sm like-btn" 
+          <button class="btn ${r.liked ? 'btn-danger' : 'btn-outline-danger'} btn-sm like-btn" 
                   data-reel-id="${r.id}" 
                   title="Like">
-            <i class="bi bi-heart"></i>
+            <i class="bi ${r.liked ? 'bi-heart-fill' : 'bi-heart'}"></i>
             <span class="like-count">${r.likes || 0}</span>
           </button>
-          <button class="btn btn-outline-primary btn-sm save-btn" 
+          <button class="btn ${r.saved ? 'btn-primary' : 'btn-outline-primary'} btn-sm save-btn" 
                   data-reel-id="${r.id}" 
                   title="Save">
-            <i class="bi bi-bookmark"></i>
+            <i class="bi ${r.saved ? 'bi-bookmark-fill' : 'bi-bookmark'}"></i>
           </button>
         </div>
       </div>
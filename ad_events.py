@@ -0,0 +1,270 @@
+"""
+Ad impression/click ingestion and budget pacing.
+
+record() appends an event to an in-memory buffer and returns; nothing is
+written on the request path. A background thread group-commits the buffer
+every `flush_interval` seconds, or as soon as `batch_size` events are
+waiting: one transaction appends the raw rows to ad_impressions/ad_clicks
+and folds them into the per-ad hourly aggregates in ad_stats_hourly. When
+the buffer holds `max_pending` events, new ones are counted as dropped.
+
+Each event costs the ad's cpm_cents / 1000 (impression) or cpc_cents
+(click), priced when it is recorded. PacingController tracks month-to-date
+spend per ad account -- the rollups written by every worker plus what this
+worker has buffered but not flushed yet -- and throttles an account's ads
+once its spend runs ahead of an even spread of monthly_budget_cents over the
+month, down to zero at the budget.
+"""
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+IMPRESSION, CLICK = "impression", "click"
+
+INSERT_IMPRESSION_SQL = (
+    "INSERT INTO ad_impressions (ad_id, user_id, placement, cost_cents, created_at) VALUES (?,?,?,?,?)"
+)
+INSERT_CLICK_SQL = "INSERT INTO ad_clicks (ad_id, user_id, cost_cents, created_at) VALUES (?,?,?,?)"
+ROLLUP_SQL = """
+    INSERT INTO ad_stats_hourly (ad_id, hour, impressions, clicks, spend_cents) VALUES (?,?,?,?,?)
+    ON CONFLICT(ad_id, hour) DO UPDATE SET
+        impressions = ad_stats_hourly.impressions + excluded.impressions,
+        clicks = ad_stats_hourly.clicks + excluded.clicks,
+        spend_cents = ad_stats_hourly.spend_cents + excluded.spend_cents
+"""
+ACCOUNTS_SQL = "SELECT id, status, monthly_budget_cents FROM ad_accounts"
+MONTH_SPEND_SQL = """
+    SELECT ads.ad_account_id, SUM(h.spend_cents) FROM ad_stats_hourly h
+    JOIN ads ON ads.id = h.ad_id
+    WHERE h.hour >= ? AND ads.ad_account_id IS NOT NULL
+    GROUP BY ads.ad_account_id
+"""
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def event_cost(kind, ad):
+    if kind == CLICK:
+        return float(ad.get("cpc_cents") or 0)
+    return (ad.get("cpm_cents") or 0) / 1000.0
+
+
+def _month_bounds(now):
+    start = datetime(now.year, now.month, 1)
+    end = datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+    return start, end
+
+
+class PacingController:
+    def __init__(self, clock=time.time, rng=random.random):
+        self.clock = clock
+        self.rng = rng
+        self._accounts = {}   # account id -> (status, monthly_budget_cents)
+        self._stored = {}     # account id -> month-to-date spend in the rollups
+        self._unflushed = {}  # account id -> spend buffered here, not yet committed
+        self._month = None
+        self._lock = threading.Lock()
+
+    def add(self, account_id, cents):
+        if account_id is None or not cents:
+            return
+        with self._lock:
+            self._unflushed[account_id] = self._unflushed.get(account_id, 0) + cents
+
+    def sync(self, db, committed=None):
+        """Reload budgets and stored spend; `committed` is spend that just moved from the buffer to disk."""
+        now = datetime.fromtimestamp(self.clock())
+        month_start = _month_bounds(now)[0]
+        accounts = {r[0]: (r[1], r[2] or 0) for r in db.execute(ACCOUNTS_SQL).fetchall()}
+        stored = {r[0]: r[1] or 0 for r in db.execute(MONTH_SPEND_SQL, (month_start.strftime(TIME_FORMAT),))}
+        with self._lock:
+            self._release(committed or {})
+            self._accounts, self._stored, self._month = accounts, stored, month_start
+
+    def discard(self, spent):
+        """Forget buffered spend ({account id: cents}) of events dropped before they were written."""
+        with self._lock:
+            self._release(spent)
+
+    def _release(self, spent):
+        # Caller holds self._lock
+        for account_id, cents in spent.items():
+            left = self._unflushed.get(account_id, 0) - cents
+            if left > 1e-9:
+                self._unflushed[account_id] = left
+            else:
+                self._unflushed.pop(account_id, None)
+
+    def spend(self, account_id):
+        with self._lock:
+            return self._stored.get(account_id, 0) + self._unflushed.get(account_id, 0)
+
+    def serve_probability(self, account_id):
+        """1.0 while on or behind pace, falling to 0.0 as spend reaches the budget."""
+        if account_id is None:
+            return 1.0
+        status, budget = self._accounts.get(account_id, ("active", 0))
+        if status != "active":
+            return 0.0
+        if not budget:
+            return 1.0  # no cap
+        spent = self.spend(account_id)
+        if spent >= budget:
+            return 0.0
+        now = datetime.fromtimestamp(self.clock())
+        start, end = _month_bounds(now)
+        elapsed = (now - start) / (end - start)
+        return min(1.0, (1 - spent / budget) / max(1 - elapsed, 1e-6))
+
+    def allow(self, ad):
+        p = self.serve_probability(ad.get("ad_account_id"))
+        return p >= 1.0 or (p > 0.0 and self.rng() < p)
+
+    def snapshot(self):
+        return {
+            account_id: {
+                "status": status,
+                "monthly_budget_cents": budget,
+                "spend_cents": round(self.spend(account_id), 3),
+                "serve_probability": round(self.serve_probability(account_id), 3),
+            }
+            for account_id, (status, budget) in self._accounts.items()
+        }
+
+
+class AdEventBuffer:
+    def __init__(self, connect, pacer=None, flush_interval=1.0, batch_size=1000,
+                 max_pending=100000, sync_interval=30.0):
+        self.connect = connect
+        self.pacer = pacer
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.sync_interval = sync_interval
+        self.dropped = 0
+        self.flushed = 0
+        self.errors = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._synced_at = None
+        self._thread = None
+        self._pid = None
+
+    def _ensure_flusher(self):
+        # Threads don't survive fork(); each worker flushes its own buffer
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pending = []
+                    self._stop = threading.Event()
+                    self._thread = threading.Thread(target=self._run, name="ad-events", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def record(self, kind, ad, user_id=None, placement=None):
+        """Buffer one impression/click of `ad` (a row dict); returns False if it was dropped."""
+        self._ensure_flusher()
+        cost = event_cost(kind, ad)
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append((kind, ad["id"], ad.get("ad_account_id"), user_id, placement, cost, time.time()))
+            full = len(self._pending) >= self.batch_size
+        if self.pacer is not None:
+            self.pacer.add(ad.get("ad_account_id"), cost)
+        if full:
+            self._wake.set()
+        return True
+
+    def _run(self):
+        stop = self._stop
+        while not stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.errors += 1
+
+    def flush(self):
+        """Commit everything buffered so far; returns the number of events written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            sync_due = self.pacer is not None and (
+                self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_interval)
+            if not batch and not sync_due:
+                return 0
+            committed = {}
+            db = self.connect()
+            try:
+                if batch:
+                    try:
+                        committed = self._write(db, batch)
+                    except Exception:
+                        self._requeue(batch)
+                        raise
+                if self.pacer is not None:
+                    self.pacer.sync(db, committed)
+                    self._synced_at = time.monotonic()
+            finally:
+                db.close()
+            self.flushed += len(batch)
+            return len(batch)
+
+    def _write(self, db, batch):
+        impressions, clicks, hourly, committed = [], [], {}, {}
+        for kind, ad_id, account_id, user_id, placement, cost, ts in batch:
+            at = datetime.fromtimestamp(ts)
+            created_at = at.strftime(TIME_FORMAT)
+            if kind == CLICK:
+                clicks.append((ad_id, user_id, cost, created_at))
+            else:
+                impressions.append((ad_id, user_id, placement, cost, created_at))
+            key = (ad_id, at.strftime("%Y-%m-%d %H:00:00"))
+            counts = hourly.setdefault(key, [0, 0, 0.0])
+            counts[0 if kind == IMPRESSION else 1] += 1
+            counts[2] += cost
+            if account_id is not None:
+                committed[account_id] = committed.get(account_id, 0) + cost
+        with db:
+            db.executemany(INSERT_IMPRESSION_SQL, impressions)
+            db.executemany(INSERT_CLICK_SQL, clicks)
+            db.executemany(ROLLUP_SQL, [(*key, *counts) for key, counts in hourly.items()])
+        return committed
+
+    def _requeue(self, batch):
+        # Put a failed batch back in front (its spend is still counted as unflushed);
+        # what doesn't fit is dropped, and so is its spend
+        with self._lock:
+            room = max(self.max_pending - len(self._pending), 0)
+            dropped = batch[room:]
+            self.dropped += len(dropped)
+            self._pending[:0] = batch[:room]
+        if self.pacer is not None and dropped:
+            spent = {}
+            for _, _, account_id, _, _, cost, _ in dropped:
+                if account_id is not None:
+                    spent[account_id] = spent.get(account_id, 0) + cost
+            self.pacer.discard(spent)
+
+    def close(self, timeout=5):
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception:
+            self.errors += 1
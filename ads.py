@@ -0,0 +1,209 @@
+"""
+In-memory ad inventory.
+
+Every worker loads the ads table once and serves the landing page's
+carousels from memory. Ads whose starts_at is still ahead, or that have an
+ends_at, are put on a hashed timing wheel; each select() first advances the
+wheel to the current second, so ads switch on and off on schedule without
+touching the database.
+
+Writes to the ads table bump a version number (triggers in init_db). The
+inventory reads that single row at most every `check_interval` seconds and
+reloads everything when it changed; invalidate() forces a reload in the
+current process.
+
+Ads may be geo-targeted with target_lat/target_lng/target_radius_miles; a
+targeted ad is only shown to viewers within its radius, and never when the
+viewer's location is unknown.
+"""
+import math
+import threading
+import time
+
+from recurrence import parse_datetime
+
+VERSION_SQL = "SELECT version FROM cache_versions WHERE name='ads'"
+LOAD_SQL = "SELECT * FROM ads WHERE is_active=1 ORDER BY id"
+
+ACTIVATE, EXPIRE = 0, 1
+
+
+def _timestamp(value):
+    """Naive local timestamps as stored in the table -> epoch seconds (None if unset/invalid)."""
+    if not value:
+        return None
+    try:
+        return parse_datetime(value).timestamp()
+    except ValueError:
+        return None
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel with one-second ticks. An entry lives in slot
+    `deadline_tick % slots` and fires once the wheel has advanced past its
+    deadline; entries further away than one revolution simply stay put until
+    a later pass reaches them.
+    """
+
+    def __init__(self, slots=512, resolution=1.0):
+        self.slots = slots
+        self.resolution = resolution
+        self._wheel = [[] for _ in range(slots)]
+        self._tick = None
+        self.pending = 0
+
+    def schedule(self, deadline, item):
+        tick = int(deadline // self.resolution)
+        self._wheel[tick % self.slots].append((deadline, item))
+        self.pending += 1
+
+    def advance(self, now):
+        """Fired items, in deadline order, for everything due at or before `now`."""
+        tick = int(now // self.resolution)
+        if not self.pending:
+            self._tick = tick
+            return []
+        start = tick if self._tick is None else self._tick
+        # After a long idle gap one full revolution covers every slot
+        ticks = range(start, tick + 1) if tick - start < self.slots else range(self.slots)
+        fired = []
+        for t in ticks:
+            slot = self._wheel[t % self.slots]
+            if not slot:
+                continue
+            due = [e for e in slot if e[0] <= now]
+            if due:
+                slot[:] = [e for e in slot if e[0] > now]
+                fired.extend(due)
+        self._tick = tick
+        self.pending -= len(fired)
+        fired.sort(key=lambda e: e[0])
+        return [item for _, item in fired]
+
+
+class AdInventory:
+    def __init__(self, check_interval=5.0, clock=time.time):
+        self.check_interval = check_interval
+        self.clock = clock
+        self.version = None
+        self.loads = 0
+        self._ads = {}            # id -> ad dict, every ad that is or will be live
+        self._live = set()        # ids currently inside their schedule
+        self._by_position = {}    # position -> (untargeted ads, targeted ads), ordered by id
+        self._wheel = TimingWheel()
+        self._checked_at = None
+        self._stale = True
+        self._lock = threading.Lock()
+
+    # -- loading --------------------------------------------------------------
+    def invalidate(self):
+        """Reload from the database on the next select() in this process."""
+        self._stale = True
+
+    def refresh(self, connect):
+        """
+        Reload if forced, or if the stored version moved since the last check.
+        `connect` returns a connection and is only called when a check is due.
+        """
+        now = time.monotonic()
+        if not self._stale and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        db = connect()
+        try:
+            row = db.execute(VERSION_SQL).fetchone()
+        except Exception:
+            row = None  # not migrated yet; load() copes with a missing ads table too
+        version = row[0] if row else 0
+        if not self._stale and version == self.version:
+            return False
+        self.load(db, version)
+        return True
+
+    def load(self, db, version=None):
+        try:
+            rows = [dict(r) for r in db.execute(LOAD_SQL).fetchall()]
+        except Exception:
+            rows = []  # ads table might not exist yet; serve no ads
+        now = self.clock()
+        ads, live, wheel = {}, set(), TimingWheel()
+        for ad in rows:
+            starts, ends = _timestamp(ad.get("starts_at")), _timestamp(ad.get("ends_at"))
+            if ends is not None and (ends <= now or (starts is not None and ends <= starts)):
+                continue
+            ads[ad["id"]] = ad
+            if starts is not None and starts > now:
+                wheel.schedule(starts, (ACTIVATE, ad["id"]))
+            else:
+                live.add(ad["id"])
+            if ends is not None:
+                wheel.schedule(ends, (EXPIRE, ad["id"]))
+        wheel.advance(now)
+        with self._lock:
+            self._ads, self._live, self._wheel = ads, live, wheel
+            self._by_position = self._index(ads, live)
+            self.version = version
+            self._stale = False
+            self.loads += 1
+
+    @staticmethod
+    def _index(ads, live):
+        by_position = {}
+        for ad_id in sorted(live):
+            ad = ads[ad_id]
+            untargeted, targeted = by_position.setdefault(ad.get("position") or "header", ([], []))
+            if ad.get("target_lat") is not None and ad.get("target_lng") is not None:
+                targeted.append(ad)
+            else:
+                untargeted.append(ad)
+        return by_position
+
+    # -- schedule -------------------------------------------------------------
+    def _tick(self):
+        now = self.clock()
+        with self._lock:
+            fired = self._wheel.advance(now)
+            if not fired:
+                return
+            for action, ad_id in fired:
+                if action == ACTIVATE:
+                    if ad_id in self._ads:
+                        self._live.add(ad_id)
+                else:
+                    self._live.discard(ad_id)
+                    self._ads.pop(ad_id, None)
+            self._by_position = self._index(self._ads, self._live)
+
+    # -- selection ------------------------------------------------------------
+    def select(self, position, lat=None, lng=None):
+        """Live ads for `position` ordered by id; targeted ones only if (lat, lng) is in range."""
+        self._tick()
+        untargeted, targeted = self._by_position.get(position, ((), ()))
+        if not targeted or lat is None or lng is None:
+            return list(untargeted)
+        nearby = [ad for ad in targeted if _within(ad, lat, lng)]
+        if not nearby:
+            return list(untargeted)
+        return sorted([*untargeted, *nearby], key=lambda ad: ad["id"])
+
+    def get(self, ad_id):
+        """The ad if it is loaded and not yet expired (it may still be waiting for starts_at)."""
+        return self._ads.get(ad_id)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "loads": self.loads,
+            "ads": len(self._ads),
+            "live": len(self._live),
+            "scheduled": self._wheel.pending,
+        }
+
+
+def _within(ad, lat, lng):
+    radius = ad.get("target_radius_miles") or 0
+    # Equirectangular approximation: plenty for city-scale radii and far cheaper than haversine
+    dlat = math.radians(ad["target_lat"] - lat)
+    dlng = math.radians(ad["target_lng"] - lng) * math.cos(math.radians((ad["target_lat"] + lat) / 2))
+    return 3958.8 * math.hypot(dlat, dlng) <= radius
@@ -0,0 +1,175 @@
+"""
+Background jobs for slow AI calls (ad copy, logos).
+
+submit() never calls the model. It returns a job id straight away and a
+small thread pool in the worker runs the job; clients poll the job, or
+long-poll with wait(). Jobs and results are kept in SQLite so any worker can
+answer for a job another worker is running.
+
+Requests are keyed by a hash of their kind and parameters (model, prompt,
+size, ...):
+
+    cache   a finished result for the same hash, younger than `cache_ttl`,
+            is returned as an already-done job without calling the API
+    dedup   while a job for the same hash is queued or running, in this
+            worker or another, submit() hands back that job instead of
+            starting a second one
+
+A job left "running" for longer than `timeout` after it started, or still
+"queued" that long after it was submitted (its worker died), reads as failed,
+and a new submit for the same hash starts over. `timeout` must be longer than
+the slowest runner call, or a live job would be started a second time.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def prompt_hash(kind, params):
+    canonical = json.dumps({"kind": kind, **params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _row_to_job(row, timeout, now):
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    if job["status"] in (QUEUED, RUNNING) and now - (job["started_at"] or job["created_at"]) > timeout:
+        job["status"], job["error"] = FAILED, "timed out"
+    return job
+
+
+class AiJobs:
+    def __init__(self, connect, runners, workers=2, queue_size=50, timeout=180.0, cache_ttl=30 * 86400):
+        """`runners`: kind -> callable(params) returning a JSON-able result dict."""
+        self.connect = connect
+        self.runners = runners
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_hits = 0
+        self.deduplicated = 0
+        self._inflight = {}  # prompt hash -> (job id, threading.Event)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _pool(self):
+        if self._pid != os.getpid():
+            self._inflight = {}
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ai-jobs")
+            self._pid = os.getpid()
+        return self._executor
+
+    def _insert(self, db, job_id, kind, h, status, user_id, result=None):
+        now = time.time()
+        db.execute(
+            "INSERT INTO ai_jobs (id, kind, prompt_hash, status, result, user_id, created_at, finished_at)"
+            " VALUES (?,?,?,?,?,?,?,?)",
+            (job_id, kind, h, status, json.dumps(result) if result is not None else None, user_id, now,
+             now if status == DONE else None),
+        )
+        db.commit()
+
+    def submit(self, kind, params, user_id=None):
+        """Returns (job id, how): how is "cached", "deduplicated" or "queued"."""
+        if kind not in self.runners:
+            raise KeyError(kind)
+        h = prompt_hash(kind, params)
+        now = time.time()
+        db = self.connect()
+        try:
+            cached = db.execute("SELECT result FROM ai_cache WHERE prompt_hash=? AND created_at >= ?",
+                                (h, now - self.cache_ttl)).fetchone()
+            if cached:
+                job_id = uuid.uuid4().hex
+                self._insert(db, job_id, kind, h, DONE, user_id, json.loads(cached[0]))
+                self.cache_hits += 1
+                return job_id, "cached"
+
+            with self._lock:
+                pool = self._pool()
+                if h in self._inflight:
+                    self.deduplicated += 1
+                    return self._inflight[h][0], "deduplicated"
+                running = db.execute(
+                    "SELECT id FROM ai_jobs WHERE prompt_hash=? AND status IN (?, ?)"
+                    " AND COALESCE(started_at, created_at) >= ?"
+                    " ORDER BY created_at DESC LIMIT 1", (h, QUEUED, RUNNING, now - self.timeout)).fetchone()
+                if running:
+                    self.deduplicated += 1
+                    return running[0], "deduplicated"
+                if len(self._inflight) >= self.queue_size:
+                    raise JobQueueFull(f"{len(self._inflight)} AI jobs already waiting")
+                job_id = uuid.uuid4().hex
+                self._insert(db, job_id, kind, h, QUEUED, user_id)
+                self._inflight[h] = (job_id, threading.Event())
+            pool.submit(self._run, job_id, kind, params, h)
+            return job_id, "queued"
+        finally:
+            db.close()
+
+    def _run(self, job_id, kind, params, h):
+        try:
+            db = self.connect()
+            try:
+                db.execute("UPDATE ai_jobs SET status=?, started_at=? WHERE id=?", (RUNNING, time.time(), job_id))
+                db.commit()
+                try:
+                    result = self.runners[kind](params)
+                except Exception as e:
+                    db.execute("UPDATE ai_jobs SET status=?, error=?, finished_at=? WHERE id=?",
+                               (FAILED, str(e)[:500], time.time(), job_id))
+                else:
+                    encoded = json.dumps(result)
+                    db.execute("UPDATE ai_jobs SET status=?, result=?, finished_at=? WHERE id=?",
+                               (DONE, encoded, time.time(), job_id))
+                    db.execute("INSERT INTO ai_cache (prompt_hash, kind, result, created_at) VALUES (?,?,?,?)"
+                               " ON CONFLICT (prompt_hash) DO UPDATE SET result = excluded.result,"
+                               " created_at = excluded.created_at", (h, kind, encoded, time.time()))
+                db.commit()
+            finally:
+                db.close()
+        finally:
+            with self._lock:
+                entry = self._inflight.pop(h, None)
+            if entry:
+                entry[1].set()
+
+    def get(self, job_id):
+        db = self.connect()
+        try:
+            db.row_factory = _dict_factory
+            row = db.execute("SELECT * FROM ai_jobs WHERE id=?", (job_id,)).fetchone()
+        finally:
+            db.close()
+        return _row_to_job(row, self.timeout, time.time()) if row else None
+
+    def wait(self, job_id, timeout):
+        """The job once it is done/failed, or as it stands after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            event = next((e for jid, e in self._inflight.values() if jid == job_id), None)
+        if event is not None:
+            event.wait(timeout)
+            return self.get(job_id)
+        # Running in another worker (or not at all): poll the row
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED) or time.monotonic() >= deadline:
+                return job
+            time.sleep(min(0.25, max(deadline - time.monotonic(), 0)))
+
+
+def _dict_factory(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
@@ -0,0 +1,97 @@
+"""
+Benchmark the profile library endpoint against the old favorites query.
+
+The old faved/saved queries joined vendor_likes and vendor_saves together
+and used COUNT(DISTINCT ...), so every popular vendor produced likes x saves
+intermediate rows. This seeds a scratch database with popular vendors and
+times both shapes.
+
+    python benchmarks/bench_library.py --fans 2000 --vendors 25
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+
+LEGACY_FAVED_SQL = """
+    SELECT v.*, vl.created_at as faved_at,
+           COALESCE(COUNT(DISTINCT vl2.id), 0) as like_count,
+           COALESCE(COUNT(DISTINCT vs.id), 0) as save_count
+    FROM vendors v
+    JOIN vendor_likes vl ON v.id = vl.vendor_id
+    LEFT JOIN vendor_likes vl2 ON v.id = vl2.vendor_id
+    LEFT JOIN vendor_saves vs ON v.id = vs.vendor_id
+    WHERE vl.user_id = ?
+    GROUP BY v.id, vl.created_at
+    ORDER BY vl.created_at DESC
+"""
+
+
+def seed(db, fans, vendors):
+    """Every fan likes and saves every vendor; user 1 is the viewer."""
+    db.executemany(
+        "INSERT INTO users (id, email, password_hash, name, role) VALUES (?, ?, 'x', ?, 'customer')",
+        ((i, f"fan{i}@example.com", f"Fan {i}") for i in range(1, fans + 1)),
+    )
+    db.executemany(
+        "INSERT INTO vendors (id, owner_user_id, name, cuisine, is_active) VALUES (?, 1, ?, 'tacos', 1)",
+        ((i, f"Truck {i}") for i in range(1, vendors + 1)),
+    )
+    pairs = [(v, u) for v in range(1, vendors + 1) for u in range(1, fans + 1)]
+    db.executemany("INSERT INTO vendor_likes (vendor_id, user_id) VALUES (?, ?)", pairs)
+    db.executemany("INSERT INTO vendor_saves (vendor_id, user_id) VALUES (?, ?)", pairs)
+    db.commit()
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fans", type=int, default=1000, help="likes and saves per vendor")
+    parser.add_argument("--vendors", type=int, default=20, help="popular vendors the viewer follows")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = app_module.app
+        app.config.update(DATABASE=os.path.join(tmp, "bench.db"), TESTING=True)
+        app_module.init_db()
+
+        with app.app_context():
+            db = app_module.get_db()
+            seed(db, args.fans, args.vendors)
+            legacy = timed(lambda: db.execute(LEGACY_FAVED_SQL, (1,)).fetchall(), args.repeat)
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+
+        def library():
+            resp = client.get("/api/users/1/library")
+            assert resp.status_code == 200
+            data = resp.get_json()
+            assert len(data["faved"]) == args.vendors
+            assert data["faved"][0]["like_count"] == args.fans
+
+        current = timed(library, args.repeat)
+
+    print(f"vendors={args.vendors} fans/vendor={args.fans}")
+    print(f"legacy faved query (one list): {legacy * 1000:9.1f} ms")
+    print(f"/library (faved + saved):      {current * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Mixed login + browse traffic against a threaded dev server.
+
+Login threads hammer POST /login (half of them with a wrong password) while
+browse threads fetch /api/vendors. Runs once with hashing inline on the
+request threads and once through the bounded hashing pool, and reports
+browse latency plus the login status mix for each.
+
+    python benchmarks/bench_password_hashing.py --seconds 5 --logins 16 --browsers 4
+"""
+import argparse
+import http.client
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import app as app_module  # noqa: E402
+
+EMAIL = "bench@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log(self, *args, **kwargs):
+        pass
+
+
+def seed(db, method):
+    db.execute(
+        "INSERT INTO users (id, email, password_hash, name, role) VALUES (1, ?, ?, 'Bench', 'customer')",
+        (EMAIL, generate_password_hash(PASSWORD, method)),
+    )
+    db.executemany(
+        "INSERT INTO vendors (owner_user_id, name, cuisine, is_active, lat, lng) VALUES (1, ?, 'tacos', 1, 34.1, -117.2)",
+        ((f"Truck {i}",) for i in range(200)),
+    )
+    db.commit()
+
+
+def run_mode(port, seconds, logins, browsers):
+    stop = time.monotonic() + seconds
+    browse_latencies = []
+    login_statuses = {}
+    lock = threading.Lock()
+
+    def login_loop(i):
+        body = urlencode({"email": EMAIL, "password": PASSWORD if i % 2 else "wrong"})
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        while time.monotonic() < stop:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            conn.request("POST", "/login", body, headers)
+            status = conn.getresponse().status
+            conn.close()
+            with lock:
+                login_statuses[status] = login_statuses.get(status, 0) + 1
+
+    def browse_loop():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            conn.request("GET", "/api/vendors")
+            conn.getresponse().read()
+            conn.close()
+            with lock:
+                browse_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(logins)]
+    threads += [threading.Thread(target=browse_loop) for _ in range(browsers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return browse_latencies, login_statuses
+
+
+def report(name, seconds, latencies, statuses):
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000  # noqa: E731
+    print(f"{name}:")
+    print(f"  browse: {len(latencies) / seconds:7.1f} req/s  p50 {p(0.50):7.1f} ms  "
+          f"p95 {p(0.95):7.1f} ms  p99 {p(0.99):7.1f} ms  mean {statistics.mean(latencies) * 1000:7.1f} ms")
+    print(f"  login statuses: {dict(sorted(statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--browsers", type=int, default=4, help="concurrent browse clients")
+    parser.add_argument("--workers", type=int, default=2, help="hashing pool processes")
+    parser.add_argument("--max-pending", type=int, default=8, help="hashing admission limit")
+    args = parser.parse_args()
+
+    app = app_module.app
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config.update(DATABASE=os.path.join(tmp, "bench.db"), TESTING=True)
+        app_module.init_db()
+        with app.app_context():
+            seed(app_module.get_db(), app.config["PASSWORD_HASH_METHOD"])
+
+        modes = [
+            ("inline (unbounded, request thread)", 0, 10_000),
+            (f"pool ({args.workers} workers, {args.max_pending} pending)", args.workers, args.max_pending),
+        ]
+        for name, workers, max_pending in modes:
+            app.config.update(PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_MAX_PENDING=max_pending)
+            app_module._password_hasher = None
+            server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                latencies, statuses = run_mode(server.port, args.seconds, args.logins, args.browsers)
+            finally:
+                server.shutdown()
+                app_module.get_password_hasher().shutdown()
+            report(name, args.seconds, latencies, statuses)
+
+
+if __name__ == "__main__":
+    main()
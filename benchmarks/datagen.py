@@ -0,0 +1,185 @@
+"""
+Generate a synthetic DeliciousRoute database at a configurable scale.
+
+Vendors cluster around a handful of metro areas, get a week of hours and a
+popularity weight; likes and saves follow that weight so a few trucks are
+very popular. Every generated user's password is BENCH_PASSWORD.
+
+    python benchmarks/datagen.py bench.db --scale large
+    python benchmarks/datagen.py bench.db --vendors 5000 --users 20000 --likes 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+BENCH_PASSWORD = "bench-password"
+
+SCALES = {
+    "tiny":   dict(vendors=200,    users=1_000,   likes=5_000,     saves=3_000,     reels=100,    reel_likes=2_000),
+    "small":  dict(vendors=2_000,  users=10_000,  likes=50_000,    saves=30_000,    reels=1_000,  reel_likes=20_000),
+    "medium": dict(vendors=10_000, users=50_000,  likes=500_000,   saves=300_000,   reels=5_000,  reel_likes=200_000),
+    "large":  dict(vendors=50_000, users=200_000, likes=2_000_000, saves=1_500_000, reels=25_000, reel_likes=1_000_000),
+}
+
+METROS = [
+    ("Los Angeles", 34.05, -118.24),
+    ("San Bernardino", 34.11, -117.29),
+    ("San Diego", 32.72, -117.16),
+    ("San Francisco", 37.77, -122.42),
+    ("Las Vegas", 36.17, -115.14),
+    ("Phoenix", 33.45, -112.07),
+]
+CUISINES = ["tacos", "burritos", "bbq", "burgers", "chinese", "thai", "pizza",
+            "desserts", "coffee", "vegan", "seafood", "korean", "hot dogs"]
+
+BATCH = 50_000
+
+
+def _batches(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(db, sql, rows):
+    for batch in _batches(rows):
+        db.executemany(sql, batch)
+
+
+def _pairs(rng, count, left_weights, right_n):
+    """Unique (left_id, right_id) pairs; left ids drawn by popularity weight."""
+    seen = set()
+    left_ids = range(1, len(left_weights) + 1)
+    count = min(count, len(left_weights) * right_n)
+    while len(seen) < count:
+        need = count - len(seen)
+        lefts = rng.choices(left_ids, weights=left_weights, k=need)
+        for left in lefts:
+            seen.add((left, rng.randint(1, right_n)))
+    return seen
+
+
+def generate(path, vendors, users, likes, saves, reels, reel_likes, seed=42, quiet=False):
+    """Create (or replace) a database at `path` with the given row counts."""
+    import app as app_module
+
+    users = max(users, vendors)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    def log(msg):
+        if not quiet:
+            print(f"[{time.perf_counter() - started:7.1f}s] {msg}")
+
+    if os.path.exists(path):
+        os.remove(path)
+    app_module.app.config["DATABASE"] = path
+    app_module.init_db()
+
+    db = sqlite3.connect(path)
+    db.executescript("""
+        PRAGMA journal_mode=OFF;
+        PRAGMA synchronous=OFF;
+        DROP TRIGGER IF EXISTS trg_vendor_likes_insert;
+        DROP TRIGGER IF EXISTS trg_vendor_likes_delete;
+        DROP TRIGGER IF EXISTS trg_vendor_saves_insert;
+        DROP TRIGGER IF EXISTS trg_vendor_saves_delete;
+    """)
+
+    pw_hash = generate_password_hash(BENCH_PASSWORD, app_module.app.config["PASSWORD_HASH_METHOD"])
+    _insert(db, "INSERT INTO users (id, email, password_hash, name, role) VALUES (?, ?, ?, ?, ?)", (
+        (i, f"user{i}@bench.test", pw_hash, f"Bench User {i}", "vendor" if i <= vendors else "customer")
+        for i in range(1, users + 1)
+    ))
+    log(f"{users} users")
+
+    def vendor_row(i):
+        city, lat0, lng0 = METROS[i % len(METROS)]
+        cuisine = ", ".join(rng.sample(CUISINES, rng.randint(1, 3)))
+        return (i, i, f"Truck {i}", f"Owner{i}", "Bench", cuisine, f"Synthetic vendor {i}",
+                lat0 + rng.gauss(0, 0.25), lng0 + rng.gauss(0, 0.25), city)
+    _insert(db, """INSERT INTO vendors (id, owner_user_id, name, first_name, last_name, cuisine,
+                   description, lat, lng, current_city, is_active) VALUES (?,?,?,?,?,?,?,?,?,?,1)""",
+            (vendor_row(i) for i in range(1, vendors + 1)))
+
+    def hour_rows():
+        for v in range(1, vendors + 1):
+            open_h = rng.randint(6, 12)
+            close_h = rng.randint(open_h + 4, 23)
+            for day in range(7):
+                if rng.random() < 0.15:
+                    yield (v, day, None, None, 1)
+                else:
+                    yield (v, day, f"{open_h:02d}:00", f"{close_h:02d}:00", 0)
+    _insert(db, """INSERT INTO vendor_hours (vendor_id, day_of_week, open_time, close_time, is_closed)
+                   VALUES (?,?,?,?,?)""", hour_rows())
+    log(f"{vendors} vendors with hours")
+
+    # Zipf-like popularity: a few trucks collect most likes and saves
+    popularity = [1.0 / (rank ** 0.9) for rank in range(1, vendors + 1)]
+    rng.shuffle(popularity)
+    created = "2025-09-01T12:00:00"
+    for table, count in (("vendor_likes", likes), ("vendor_saves", saves)):
+        _insert(db, f"INSERT INTO {table} (vendor_id, user_id, created_at) VALUES (?, ?, ?)",
+                ((v, u, created) for v, u in _pairs(rng, count, popularity, users)))
+        log(f"{count} {table}")
+
+    reel_vendors = rng.sample(range(1, vendors + 1), min(reels, vendors))
+    _insert(db, "INSERT INTO reels (id, vendor_id, title, video_url, created_at) VALUES (?, ?, ?, ?, ?)", (
+        (i, v, f"Reel {i}", f"/static/uploads/reel_{v}.mp4", f"2025-09-{1 + i % 28:02d}T12:00:00")
+        for i, v in enumerate(reel_vendors, start=1)
+    ))
+    if reel_vendors:
+        reel_popularity = [1.0 / (rank ** 0.9) for rank in range(1, len(reel_vendors) + 1)]
+        _insert(db, "INSERT INTO reel_likes (reel_id, user_id, created_at) VALUES (?, ?, ?)",
+                ((r, u, created) for r, u in _pairs(rng, reel_likes, reel_popularity, users)))
+    log(f"{len(reel_vendors)} reels, {reel_likes if reel_vendors else 0} reel likes")
+
+    app_module.rebuild_vendor_counts(db)
+    db.commit()
+    db.execute("ANALYZE")
+    db.close()
+    # Recreates the counter triggers dropped for the bulk load
+    app_module.init_db()
+    log(f"done: {path} ({os.path.getsize(path) / 1e6:.0f} MB)")
+
+
+def add_scale_arguments(parser):
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None,
+                            help=f"override the scale preset's {name} count")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def scale_from_args(args):
+    counts = dict(SCALES[args.scale])
+    for name in counts:
+        value = getattr(args, name)
+        if value is not None:
+            counts[name] = value
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="database file to create (replaced if present)")
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+    generate(args.path, seed=args.seed, **scale_from_args(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Scale benchmark for the hot endpoints.
+
+Builds (or reuses) a synthetic database with datagen.py, then drives each
+scenario twice: in-process through the Flask test client, and over HTTP
+against a threaded server with concurrent keep-alive clients. Latency
+percentiles and throughput are written as JSON so runs can be compared.
+
+    python benchmarks/run_suite.py --scale small --out baseline.json
+    python benchmarks/run_suite.py --scale small --reuse --compare baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from werkzeug.serving import WSGIRequestHandler  # noqa: E402
+
+import datagen  # noqa: E402
+
+# name -> (method, path builder, needs login)
+SCENARIOS = {
+    "api_vendors_near": ("GET", lambda rng, ctx: "/api/vendors?" + urlencode({
+        "near": "{:.4f},{:.4f}".format(*_near_point(rng)), "radius": 10}), False),
+    "api_vendor_cards": ("GET", lambda rng, ctx: "/api/vendors/cards", False),
+    "api_reels": ("GET", lambda rng, ctx: "/api/reels", False),
+    "vendor_like_toggle": ("POST", lambda rng, ctx: f"/api/vendors/{rng.randint(1, ctx['vendors'])}/like", True),
+    "reel_like_toggle": ("POST", lambda rng, ctx: f"/api/reels/{rng.randint(1, max(ctx['reels'], 1))}/like", True),
+    "vendor_page": ("GET", lambda rng, ctx: f"/vendor/{rng.randint(1, ctx['vendors'])}", False),
+}
+
+
+def _near_point(rng):
+    _, lat, lng = rng.choice(datagen.METROS)
+    return lat + rng.gauss(0, 0.1), lng + rng.gauss(0, 0.1)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log(self, *args, **kwargs):
+        pass
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"count": 0, "errors": errors}
+
+    def pct(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+    }
+
+
+def run_client(app, ctx, scenarios, requests, max_seconds, user_id):
+    """Sequential requests through the Flask test client."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    results = {}
+    for name in scenarios:
+        method, build, _ = SCENARIOS[name]
+        rng = random.Random(name)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        while len(latencies) < requests and time.perf_counter() - started < max_seconds:
+            path = build(rng, ctx)
+            t0 = time.perf_counter()
+            resp = client.open(path, method=method)
+            latencies.append(time.perf_counter() - t0)
+            errors += resp.status_code >= 400
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+        print(f"  client {name:20s} {_fmt(results[name])}")
+    return results
+
+
+def _login_cookie(port, email):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    body = urlencode({"email": email, "password": datagen.BENCH_PASSWORD})
+    conn.request("POST", "/login", body, {"Content-Type": "application/x-www-form-urlencoded"})
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    cookie = resp.getheader("Set-Cookie")
+    if resp.status != 302 or not cookie:
+        raise RuntimeError(f"bench login failed with HTTP {resp.status}")
+    return cookie.split(";", 1)[0]
+
+
+def run_http(app, ctx, scenarios, requests, max_seconds, threads, server_threads, email):
+    """Concurrent keep-alive clients against a threaded server."""
+    from server import PooledWSGIServer
+
+    server = PooledWSGIServer("127.0.0.1", 0, app, threads=server_threads, handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = {}
+    try:
+        cookie = _login_cookie(server.port, email)
+        for name in scenarios:
+            method, build, needs_login = SCENARIOS[name]
+            headers = {"Cookie": cookie} if needs_login else {}
+            latencies, errors = [], [0]
+            lock = threading.Lock()
+            remaining = [requests]
+            deadline = time.perf_counter() + max_seconds
+
+            def worker(seed):
+                rng = random.Random(f"{name}-{seed}")
+                conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=120)
+                while time.perf_counter() < deadline:
+                    with lock:
+                        if remaining[0] <= 0:
+                            break
+                        remaining[0] -= 1
+                    path = build(rng, ctx)
+                    t0 = time.perf_counter()
+                    try:
+                        conn.request(method, path, headers=headers)
+                        resp = conn.getresponse()
+                        resp.read()
+                        failed = resp.status >= 400
+                    except (OSError, http.client.HTTPException):
+                        conn.close()
+                        conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=120)
+                        failed = True
+                    elapsed = time.perf_counter() - t0
+                    with lock:
+                        latencies.append(elapsed)
+                        errors[0] += failed
+                conn.close()
+
+            started = time.perf_counter()
+            workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            results[name] = summarize(latencies, errors[0], time.perf_counter() - started)
+            print(f"  http   {name:20s} {_fmt(results[name])}")
+    finally:
+        server.shutdown()
+        server.drain(5)
+    return results
+
+
+def _fmt(summary):
+    if not summary["count"]:
+        return "no requests completed"
+    return (f"n={summary['count']:<6} err={summary['errors']:<4} p50={summary['p50_ms']:9.2f}ms "
+            f"p95={summary['p95_ms']:9.2f}ms p99={summary['p99_ms']:9.2f}ms "
+            f"{summary['throughput_rps']:8.1f} req/s")
+
+
+def compare(current, baseline, tolerance):
+    """Print per-scenario deltas; returns the list of regressions."""
+    regressions = []
+    print(f"\nComparison with baseline ({baseline['meta'].get('timestamp')}):")
+    for mode, scenarios in current["results"].items():
+        for name, now in scenarios.items():
+            before = baseline.get("results", {}).get(mode, {}).get(name)
+            if not before or not before.get("count") or not now.get("count"):
+                continue
+            p95 = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+            rps = now["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+            flag = ""
+            if p95 > tolerance or rps < -tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{mode}/{name}")
+            print(f"  {mode:6s} {name:20s} p95 {p95:+7.1%}  throughput {rps:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    datagen.add_scale_arguments(parser)
+    parser.add_argument("--db", default=os.path.join(HERE, "bench.db"), help="benchmark database path")
+    parser.add_argument("--reuse", action="store_true", help="reuse --db instead of regenerating it")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--modes", nargs="+", choices=("client", "http"), default=["client", "http"])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and mode")
+    parser.add_argument("--max-seconds", type=float, default=30, help="time cap per scenario and mode")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument("--server-threads", type=int, default=16)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput drift")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    counts = datagen.scale_from_args(args)
+    if not (args.reuse and os.path.exists(args.db)):
+        datagen.generate(args.db, seed=args.seed, **counts)
+
+    import app as app_module
+    app = app_module.app
+    # One viewer hammers the same endpoints, so the per-client rate limits would turn most
+    # toggle scenarios into timed 429s
+    app.config.update(DATABASE=args.db, TESTING=True, RATE_LIMIT_ENABLED=False)
+    ctx = dict(counts)
+    # A customer account; its likes toggle on and off across the run
+    viewer_id = max(counts["users"], counts["vendors"])
+
+    results = {}
+    if "client" in args.modes:
+        print("Flask test client:")
+        results["client"] = run_client(app, ctx, args.scenarios, args.requests, args.max_seconds, viewer_id)
+    if "http" in args.modes:
+        print(f"HTTP ({args.threads} clients, {args.server_threads} server threads):")
+        results["http"] = run_http(app, ctx, args.scenarios, args.requests, args.max_seconds,
+                                   args.threads, args.server_threads, f"user{viewer_id}@bench.test")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": counts,
+            "requests": args.requests,
+            "threads": args.threads,
+            "server_threads": args.server_threads,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+        print(f"\nwrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(f"regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Streaming bulk import of vendors, weekly hours and locations.
+
+Input is CSV (header row) or NDJSON (one object per line) and is read
+incrementally, so memory stays flat whatever the file size. Each record is
+validated as it arrives; valid rows are written with executemany in chunks,
+one transaction per chunk. If a chunk is rejected by the database, its rows
+are retried one at a time, each under a savepoint, so the error lands on the
+offending row only (PostgreSQL would otherwise abort the rest of the chunk).
+
+Records refer to vendors by `vendor_external_id` (the `external_id` given
+when the vendor was imported) or by `vendor_id`.
+
+    vendors    external_id, owner_email | owner_user_id, name, cuisine,
+               description, website, first_name, last_name, social_facebook,
+               social_instagram, social_twitter, is_active, lat, lng,
+               address, current_city
+    hours      vendor ref, day_of_week (0=Monday or a day name),
+               open_time, close_time (HH:MM, 24h), is_closed
+    locations  vendor ref, lat, lng, address, current_city
+"""
+import codecs
+import csv
+import json
+import re
+import sqlite3
+from datetime import datetime
+
+KINDS = ("vendors", "hours", "locations")
+FORMATS = ("csv", "ndjson")
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_HHMM = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+
+# SQLite's default limit on host parameters in one statement
+_MAX_VARS = 900
+
+VENDOR_TEXT_FIELDS = ("cuisine", "description", "website", "first_name", "last_name",
+                      "social_facebook", "social_instagram", "social_twitter",
+                      "address", "current_city")
+
+UPSERT_VENDOR_SQL = f"""
+    INSERT INTO vendors (external_id, owner_user_id, name, is_active, lat, lng, last_updated,
+                         {", ".join(VENDOR_TEXT_FIELDS)})
+    VALUES (?, ?, ?, COALESCE(?, 1), ?, ?, ?, {", ".join("?" for _ in VENDOR_TEXT_FIELDS)})
+    ON CONFLICT(external_id) DO UPDATE SET
+        owner_user_id = excluded.owner_user_id,
+        name = excluded.name,
+        is_active = COALESCE(?, vendors.is_active),
+        lat = COALESCE(excluded.lat, vendors.lat),
+        lng = COALESCE(excluded.lng, vendors.lng),
+        last_updated = COALESCE(excluded.last_updated, vendors.last_updated),
+        {", ".join(f"{f} = COALESCE(excluded.{f}, vendors.{f})" for f in VENDOR_TEXT_FIELDS)}
+"""
+
+UPSERT_HOURS_SQL = """
+    INSERT INTO vendor_hours (vendor_id, day_of_week, open_time, close_time, is_closed)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(vendor_id, day_of_week) DO UPDATE SET
+        open_time = excluded.open_time,
+        close_time = excluded.close_time,
+        is_closed = excluded.is_closed
+"""
+
+UPDATE_LOCATION_SQL = """
+    UPDATE vendors SET lat = ?, lng = ?, last_updated = ?,
+        address = COALESCE(?, address), current_city = COALESCE(?, current_city)
+    WHERE id = ?
+"""
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, kind, max_errors=1000):
+        self.kind = kind
+        self.max_errors = max_errors
+        self.rows = 0
+        self.written = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self):
+        # Unknown references are only found when a chunk is flushed, so re-sort
+        return {"kind": self.kind, "rows": self.rows, "written": self.written,
+                "error_count": self.error_count, "errors": sorted(self.errors, key=lambda e: e["line"]),
+                "errors_truncated": self.error_count > len(self.errors)}
+
+
+# ------------------------------------------------------------------------------
+# Reading
+# ------------------------------------------------------------------------------
+def text_lines(binary):
+    """Decode a binary stream line by line without reading it all."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    for chunk in iter(lambda: binary.read(64 * 1024), b""):
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def read_records(lines, fmt):
+    """Yield (line number, dict) from CSV or NDJSON text lines; bad lines yield an Exception."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, RowError("more fields than the header")
+            else:
+                yield reader.line_num, record
+        return
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, RowError(f"invalid JSON: {e}")
+            continue
+        yield line_no, record if isinstance(record, dict) else RowError("expected a JSON object")
+
+
+def detect_format(name="", content_type=""):
+    if "ndjson" in content_type or "jsonl" in content_type or name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+# ------------------------------------------------------------------------------
+# Validation
+# ------------------------------------------------------------------------------
+def _text(record, field, required=False, max_len=500):
+    value = record.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise RowError(f"{field} is required")
+        return None
+    value = str(value).strip()
+    if len(value) > max_len:
+        raise RowError(f"{field} longer than {max_len} characters")
+    return value
+
+
+def _number(record, field, low, high):
+    value = record.get(field)
+    if value is None or value == "":
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{field} is not a number") from None
+    if not low <= value <= high:
+        raise RowError(f"{field} out of range")
+    return value
+
+
+def _flag(record, field):
+    value = record.get(field)
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "y"):
+        return 1
+    if text in ("0", "false", "no", "n"):
+        return 0
+    raise RowError(f"{field} must be true/false")
+
+
+def _coordinates(record, required):
+    lat = _number(record, "lat", -90, 90)
+    lng = _number(record, "lng", -180, 180)
+    if (lat is None) != (lng is None) or (required and lat is None):
+        raise RowError("lat and lng must be given together")
+    return lat, lng
+
+
+def _vendor_ref(record):
+    external_id = _text(record, "vendor_external_id", max_len=100)
+    if external_id is not None:
+        return ("external", external_id)
+    vendor_id = record.get("vendor_id")
+    try:
+        return ("id", int(vendor_id))
+    except (TypeError, ValueError):
+        raise RowError("vendor_external_id or vendor_id is required") from None
+
+
+def _owner_ref(record):
+    email = _text(record, "owner_email", max_len=254)
+    if email is not None:
+        return ("email", email.lower())
+    try:
+        return ("id", int(record.get("owner_user_id")))
+    except (TypeError, ValueError):
+        raise RowError("owner_email or owner_user_id is required") from None
+
+
+def validate_vendor(record, now):
+    lat, lng = _coordinates(record, required=False)
+    return {
+        "ref": _owner_ref(record),
+        "values": [
+            _text(record, "external_id", required=True, max_len=100),
+            None,  # owner_user_id, resolved per chunk
+            _text(record, "name", required=True, max_len=200),
+            _flag(record, "is_active"),
+            lat, lng, now if lat is not None else None,
+            *(_text(record, f) for f in VENDOR_TEXT_FIELDS),
+        ],
+    }
+
+
+def _day(record):
+    value = record.get("day_of_week")
+    text = str(value).strip().lower() if value is not None else ""
+    if text.isdigit() and int(text) < 7:
+        return int(text)
+    for i, name in enumerate(DAYS):
+        if text in (name, name[:3]):
+            return i
+    raise RowError("day_of_week must be 0-6 (0=Monday) or a day name")
+
+
+def _hhmm(record, field):
+    value = _text(record, field, max_len=5)
+    if value is None:
+        return None
+    m = _HHMM.match(value)
+    if not m:
+        raise RowError(f"{field} must be HH:MM (24h)")
+    return f"{int(m.group(1)):02d}:{m.group(2)}"
+
+
+def validate_hours(record, now):
+    closed = _flag(record, "is_closed") or 0
+    open_time, close_time = _hhmm(record, "open_time"), _hhmm(record, "close_time")
+    if not closed and (open_time is None or close_time is None):
+        raise RowError("open_time and close_time are required unless is_closed")
+    if closed:
+        open_time = close_time = None
+    return {"ref": _vendor_ref(record), "values": [None, _day(record), open_time, close_time, closed]}
+
+
+def validate_location(record, now):
+    lat, lng = _coordinates(record, required=True)
+    return {
+        "ref": _vendor_ref(record),
+        "values": [lat, lng, now, _text(record, "address"), _text(record, "current_city"), None],
+    }
+
+
+# ------------------------------------------------------------------------------
+# Writing
+# ------------------------------------------------------------------------------
+def _lookup(db, sql, keys):
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), _MAX_VARS):
+        part = keys[i:i + _MAX_VARS]
+        found.update(db.execute(sql.format(",".join("?" * len(part))), part).fetchall())
+    return found
+
+
+def _resolve(db, kind, rows, cache):
+    """Fill in the owner/vendor id of each row; returns rows whose reference is unknown."""
+    by_kind = {}
+    for row in rows:
+        ref_kind, key = row["ref"]
+        if (ref_kind, key) not in cache:
+            by_kind.setdefault(ref_kind, set()).add(key)
+    if kind == "vendors":
+        # Signup stores emails lowercased, so the UNIQUE(email) index applies
+        queries = {"email": "SELECT email, id FROM users WHERE email IN ({})",
+                   "id": "SELECT id, id FROM users WHERE id IN ({})"}
+    else:
+        queries = {"external": "SELECT external_id, id FROM vendors WHERE external_id IN ({})",
+                   "id": "SELECT id, id FROM vendors WHERE id IN ({})"}
+    for ref_kind, keys in by_kind.items():
+        found = _lookup(db, queries[ref_kind], keys)
+        for key in keys:
+            cache[(ref_kind, key)] = found.get(key)
+
+    missing = []
+    slot = 1 if kind == "vendors" else (0 if kind == "hours" else 5)
+    for row in rows:
+        row["values"][slot] = cache[row["ref"]]
+        if row["values"][slot] is None:
+            missing.append(row)
+    return missing
+
+
+def _write_chunk(db, kind, rows, report, dry_run, errors):
+    sql = {"vendors": UPSERT_VENDOR_SQL, "hours": UPSERT_HOURS_SQL, "locations": UPDATE_LOCATION_SQL}[kind]
+
+    def params(row):
+        values = row["values"]
+        # The upsert's UPDATE branch needs is_active again to keep it when not given
+        return values + [values[3]] if kind == "vendors" else values
+
+    try:
+        db.executemany(sql, [params(r) for r in rows])
+        written = len(rows)
+    except errors:
+        db.rollback()
+        if isinstance(db, sqlite3.Connection):
+            # Keep the chunk one transaction: outside one, sqlite3 commits each SAVEPOINT on RELEASE
+            db.execute("BEGIN")
+        written = 0
+        for row in rows:
+            db.execute("SAVEPOINT import_row")
+            try:
+                db.execute(sql, params(row))
+                written += 1
+            except errors as e:
+                db.execute("ROLLBACK TO SAVEPOINT import_row")
+                report.error(row["line"], f"database rejected row: {e}")
+            db.execute("RELEASE SAVEPOINT import_row")
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+    report.written += written
+
+
+VALIDATORS = {"vendors": validate_vendor, "hours": validate_hours, "locations": validate_location}
+
+
+def import_records(db, kind, records, chunk_size=2000, dry_run=False, max_errors=1000, progress=None,
+                   errors=(sqlite3.Error,)):
+    """
+    Validate and write (line, record) pairs; returns an ImportReport.
+    `errors`: the exceptions `db` raises for rejected rows (the backend's Database.errors).
+    """
+    if kind not in VALIDATORS:
+        raise ValueError(f"unknown import kind {kind!r}")
+    validate = VALIDATORS[kind]
+    report = ImportReport(kind, max_errors)
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    cache = {}
+    chunk = []
+
+    def flush():
+        unknown = _resolve(db, kind, chunk, cache)
+        for row in unknown:
+            what = "owner user" if kind == "vendors" else "vendor"
+            report.error(row["line"], f"unknown {what} {row['ref'][1]!r}")
+        if unknown:
+            skip = {id(r) for r in unknown}
+            valid = [r for r in chunk if id(r) not in skip]
+        else:
+            valid = chunk
+        if valid:
+            _write_chunk(db, kind, valid, report, dry_run, errors)
+        chunk.clear()
+        if progress:
+            progress(report)
+
+    for line, record in records:
+        report.rows += 1
+        if isinstance(record, Exception):
+            report.error(line, str(record))
+            continue
+        try:
+            row = validate(record, now)
+        except RowError as e:
+            report.error(line, str(e))
+            continue
+        row["line"] = line
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return report
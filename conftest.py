@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import app as app_module
+
+# Point at a scratch PostgreSQL database (its public schema is dropped!) to run every test that
+# takes the `backend` fixture against both SQLite and PostgreSQL, e.g.
+#   TEST_DATABASE_URL=postgresql://postgres@127.0.0.1/deliciousroute_test python -m pytest -q
+PG_URL = os.getenv("TEST_DATABASE_URL", "")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "sqlite_only: the test relies on SQLite itself (its file, PRAGMAs, query plans)")
+
+
+@pytest.fixture(params=["sqlite", "postgres"] if PG_URL else ["sqlite"])
+def backend(request, monkeypatch):
+    """
+    The database app fixtures run on. For "postgres" the app's DATABASE_URL points
+    at an emptied TEST_DATABASE_URL; the fixture's own init_db() creates the schema.
+    """
+    if request.param == "postgres":
+        if request.node.get_closest_marker("sqlite_only"):
+            pytest.skip("SQLite only")
+        psycopg = pytest.importorskip("psycopg")
+        with psycopg.connect(PG_URL, autocommit=True) as conn:
+            conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+        monkeypatch.setitem(app_module.app.config, "DATABASE_URL", PG_URL)
+        monkeypatch.setattr(app_module, "_database", None)
+    yield request.param
+    if request.param == "postgres":
+        app_module.close_invalidation_bus()
+        app_module.close_database()
@@ -0,0 +1,419 @@
+"""
+Database access for SQLite (development, tests) and PostgreSQL (production).
+
+open_database(url) takes a file path / sqlite:///path or a postgresql://
+URL. Either way connect() returns something that behaves like a sqlite3
+connection to the rest of the app:
+
+    execute(sql, params)    `?` and `:name` placeholders on both backends
+    rows                    addressable by index and by column name
+    commit/rollback/close   close() on PostgreSQL returns the connection to
+                            the pool, rolling back anything uncommitted
+
+PostgreSQL connections come from a bounded per-process pool; when every
+connection is busy, connect() waits up to `pool_timeout` seconds and then
+raises PoolTimeout instead of opening more connections than the server
+allows.
+
+connect(readonly=True) gives a connection that cannot write: on SQLite a
+mode=ro URI (with the database in WAL mode readers never wait for the
+writer), on PostgreSQL a read-only session from the replica pool when a
+`read_url` is configured, else from the primary pool.
+
+The Dialect object of each database builds the statements that differ
+between backends: insert() returns the new row through RETURNING where the
+backend has it (PostgreSQL, SQLite >= 3.35) instead of a second SELECT,
+and upsert() uses INSERT ... ON CONFLICT DO UPDATE (SQLite >= 3.24).
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import quote
+
+POSTGRES_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "app_schema.postgres.sql")
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free in time."""
+
+
+@lru_cache(maxsize=1024)
+def translate_placeholders(sql):
+    """Rewrite qmark/named placeholders to psycopg's %s / %(name)s, escaping literal %."""
+    out = []
+    i, n = 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c in "'\"":
+            j = i + 1
+            while j < n:
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:  # doubled quote inside the literal
+                        j += 2
+                        continue
+                    break
+                j += 1
+            out.append(sql[i:j + 1].replace("%", "%%"))
+            i = j + 1
+        elif c == "-" and sql.startswith("--", i):
+            j = sql.find("\n", i)
+            j = n if j == -1 else j
+            out.append(sql[i:j].replace("%", "%%"))
+            i = j
+        elif c == "?":
+            out.append("%s")
+            i += 1
+        elif c == ":" and i + 1 < n and (sql[i + 1].isalpha() or sql[i + 1] == "_") and sql[i - 1:i] != ":":
+            j = i + 1
+            while j < n and (sql[j].isalnum() or sql[j] == "_"):
+                j += 1
+            out.append(f"%({sql[i + 1:j]})s")
+            i = j
+        elif c == ":" and sql.startswith("::", i):
+            out.append("::")  # PostgreSQL cast
+            i += 2
+        elif c == "%":
+            out.append("%%")
+            i += 1
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+class Row(tuple):
+    """A result row readable by position or column name, like sqlite3.Row."""
+
+    def __new__(cls, values, index):
+        row = super().__new__(cls, values)
+        row._index = index
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._index)
+
+
+class Dialect:
+    def __init__(self, name, returning, upsert):
+        self.name = name
+        self.returning = returning
+        self.upsert_supported = upsert
+
+    def insert(self, db, table, values, returning="id"):
+        """INSERT `values` (column -> value); returns the new row's `returning` columns."""
+        columns = ", ".join(values)
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(values))})"
+        params = tuple(values.values())
+        if self.returning:
+            return db.execute(f"{sql} RETURNING {returning}", params).fetchall()[0]
+        cur = db.execute(sql, params)
+        return db.execute(f"SELECT {returning} FROM {table} WHERE rowid=?", (cur.lastrowid,)).fetchone()
+
+    def upsert(self, table, columns, conflict, update=None):
+        """INSERT that overwrites `update` (default: every non-key column) when `conflict` matches."""
+        update = [c for c in columns if c not in conflict] if update is None else update
+        marks = ", ".join("?" * len(columns))
+        if not self.upsert_supported:
+            return f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({marks})"
+        action = ("DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in update)) if update else "DO NOTHING"
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})"
+                f" ON CONFLICT ({', '.join(conflict)}) {action}")
+
+
+SQLITE = Dialect("sqlite", returning=sqlite3.sqlite_version_info >= (3, 35), upsert=sqlite3.sqlite_version_info >= (3, 24))
+POSTGRES = Dialect("postgresql", returning=True, upsert=True)
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=10, timeout=5.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = []  # LIFO: the warmest connection is reused first
+        self._created = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        self.waits = 0
+        self.timeouts = 0
+
+    def _check_fork(self):
+        # Sockets inherited from the parent must not be used (or closed) by a forked worker
+        if self._pid != os.getpid():
+            self._idle, self._created, self._pid = [], 0, os.getpid()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._check_fork()
+            while not self._idle and self._created >= self.size:
+                self.waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._created >= self.size:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"all {self.size} database connections busy for {self.timeout}s")
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, broken=False):
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if broken:
+                self._created -= 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+        if broken:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {"size": self.size, "open": self._created, "in_use": self._created - len(self._idle),
+                    "waits": self.waits, "timeouts": self.timeouts}
+
+
+class PostgresCursor:
+    def __init__(self, connection, raw):
+        self.connection = connection
+        self._raw = raw
+        self._index = None
+
+    def _run(self, fn, sql, params):
+        conn = self.connection
+        span = conn.trace.leaf("postgresql", **{"db.statement": sql}) if conn.trace is not None else None
+        if conn.trace_callback is not None:
+            conn.trace_callback(sql)
+        start = time.perf_counter()
+        try:
+            # Without parameters psycopg sends the text as is, so only translate when there are some
+            fn(translate_placeholders(sql), params) if params else fn(sql)
+        finally:
+            conn.record(time.perf_counter() - start)
+            if span is not None:
+                span.finish()
+        description = self._raw.description
+        self._index = {col.name: i for i, col in enumerate(description)} if description else None
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(self._raw.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(self._raw.executemany, sql, list(seq_of_parameters))
+
+    def _row(self, values):
+        factory = self.connection.row_factory
+        return factory(self, values) if factory is not None else Row(values, self._index)
+
+    def fetchone(self):
+        values = self._raw.fetchone()
+        return None if values is None else self._row(values)
+
+    def fetchmany(self, size=1):
+        return [self._row(v) for v in self._raw.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(v) for v in self._raw.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    lastrowid = None  # use Dialect.insert (RETURNING) instead
+
+    def close(self):
+        self._raw.close()
+
+
+class PostgresConnection:
+    """A pooled psycopg connection with the sqlite3.Connection surface the app uses."""
+
+    trace = None  # tracing.Trace of the request, when sampled
+    trace_callback = None
+
+    def __init__(self, pool, raw, readonly=False):
+        self._pool = pool
+        self._raw = raw
+        if readonly:
+            raw.read_only = True
+        self.row_factory = None  # sqlite3-style factory(cursor, values); default Row
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    def record(self, seconds, count=True):
+        self.query_seconds += seconds
+        if count:
+            self.query_count += 1
+
+    def set_trace_callback(self, callback):
+        """Like sqlite3: `callback(sql)` for every statement (as written, before translation)."""
+        self.trace_callback = callback
+
+    def cursor(self):
+        return PostgresCursor(self, self._raw.cursor())
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        self._raw.execute(script)
+        self._raw.commit()
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    @property
+    def isolation_level(self):
+        return None if self._raw.autocommit else "DEFERRED"
+
+    @isolation_level.setter
+    def isolation_level(self, value):
+        # sqlite3's "None means autocommit"
+        self._raw.rollback()
+        self._raw.autocommit = value is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Like sqlite3: commit or roll back, but stay open
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is None:
+            return
+        broken = raw.closed or raw.broken
+        if not broken:
+            try:
+                raw.rollback()
+                raw.autocommit = False
+                raw.read_only = False
+            except Exception:
+                broken = True
+        self._pool.release(raw, broken=broken)
+
+
+class SQLiteDatabase:
+    dialect = SQLITE
+
+    def __init__(self, path, timeout=10.0):
+        self.url = path
+        self.path = path
+        self.timeout = timeout
+        self.errors = (sqlite3.Error,)
+
+    def connect(self, factory=sqlite3.Connection, readonly=False, **options):
+        """`options` go to sqlite3.connect (e.g. check_same_thread) and are ignored by PostgreSQL."""
+        if readonly:
+            uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro"
+            db = sqlite3.connect(uri, timeout=self.timeout, factory=factory, uri=True, **options)
+        else:
+            db = sqlite3.connect(self.path, timeout=self.timeout, factory=factory, **options)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def table_names(self, db):
+        return {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+    def stats(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class PostgresDatabase:
+    dialect = POSTGRES
+
+    def __init__(self, url, pool_size=10, pool_timeout=5.0, read_url=None):
+        try:
+            import psycopg
+        except ImportError:
+            raise RuntimeError("PostgreSQL support needs psycopg (pip install 'psycopg[binary]')") from None
+        self.url = url
+        self.errors = (psycopg.Error, PoolTimeout)
+        self.pool = ConnectionPool(lambda: psycopg.connect(url), pool_size, pool_timeout)
+        self.read_pool = (ConnectionPool(lambda: psycopg.connect(read_url), pool_size, pool_timeout)
+                          if read_url else self.pool)
+
+    def connect(self, factory=None, readonly=False, **options):
+        pool = self.read_pool if readonly else self.pool
+        return PostgresConnection(pool, pool.acquire(), readonly=readonly)
+
+    def table_names(self, db):
+        return {r[0] for r in db.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()")}
+
+    def init_schema(self):
+        """Create the app's tables (db/app_schema.postgres.sql); safe to run repeatedly."""
+        with open(POSTGRES_SCHEMA) as fh:
+            script = fh.read()
+        db = self.connect()
+        try:
+            db.executescript(script)
+        finally:
+            db.close()
+
+    def stats(self):
+        stats = {"primary": self.pool.stats()}
+        if self.read_pool is not self.pool:
+            stats["replica"] = self.read_pool.stats()
+        return stats
+
+    def close(self):
+        self.pool.close()
+        if self.read_pool is not self.pool:
+            self.read_pool.close()
+
+
+def open_database(url, pool_size=10, pool_timeout=5.0, read_url=None):
+    """`read_url` (a PostgreSQL replica) is ignored for SQLite, whose readers open the same file."""
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresDatabase(url, pool_size, pool_timeout, read_url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteDatabase(url)
@@ -0,0 +1,332 @@
+-- Delicious Route Flask app schema, PostgreSQL flavour of the tables init_db()
+-- creates in SQLite. Applied by init_db() when DATABASE_URL is a postgresql://
+-- URL; every statement is idempotent.
+--
+-- Timestamps stay TEXT ('YYYY-MM-DD HH:MM:SS' / ISO 8601) exactly as the app
+-- writes them, so range comparisons behave the same on both backends.
+
+CREATE TABLE IF NOT EXISTS users (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  email TEXT UNIQUE NOT NULL,
+  password_hash TEXT NOT NULL,
+  name TEXT NOT NULL,
+  role TEXT CHECK (role IN ('vendor','customer','admin')) NOT NULL DEFAULT 'customer',
+  created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:MI:SS'),
+  profile_img TEXT
+);
+
+CREATE TABLE IF NOT EXISTS vendors (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  owner_user_id BIGINT NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+  name TEXT NOT NULL,
+  cuisine TEXT,
+  description TEXT,
+  logo_url TEXT,
+  website TEXT,
+  socials TEXT,
+  is_active INTEGER DEFAULT 1,
+  lat DOUBLE PRECISION,
+  lng DOUBLE PRECISION,
+  address TEXT,
+  last_updated TEXT,
+  social_facebook TEXT,
+  social_instagram TEXT,
+  social_twitter TEXT,
+  current_city TEXT,
+  current_address TEXT,
+  first_name TEXT,
+  last_name TEXT,
+  external_id TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_vendors_external_id ON vendors (external_id);
+CREATE INDEX IF NOT EXISTS idx_vendors_location ON vendors (lat, lng);
+
+CREATE TABLE IF NOT EXISTS reels (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  vendor_id BIGINT NOT NULL REFERENCES vendors (id) ON DELETE CASCADE,
+  title TEXT,
+  video_url TEXT NOT NULL,
+  thumbnail_url TEXT,
+  created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:MI:SS')
+);
+
+CREATE TABLE IF NOT EXISTS events (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  title TEXT NOT NULL,
+  description TEXT,
+  start_time TEXT,
+  end_time TEXT,
+  location_name TEXT,
+  lat DOUBLE PRECISION,
+  lng DOUBLE PRECISION,
+  recurrence TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ends ON events (COALESCE(end_time, start_time));
+CREATE INDEX IF NOT EXISTS idx_events_recurring ON events (start_time) WHERE recurrence IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_events_location ON events (lat, lng);
+-- Event times are 'YYYY-MM-DD HH:MM:SS' so range comparisons on text are correct
+UPDATE events SET start_time = to_char(start_time::timestamp, 'YYYY-MM-DD HH24:MI:SS') WHERE start_time LIKE '%T%';
+UPDATE events SET end_time = to_char(end_time::timestamp, 'YYYY-MM-DD HH24:MI:SS') WHERE end_time LIKE '%T%';
+
+CREATE TABLE IF NOT EXISTS ad_accounts (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  vendor_id BIGINT REFERENCES vendors (id),
+  status TEXT DEFAULT 'active',
+  monthly_budget_cents INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS ads (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  image_url TEXT NOT NULL,
+  link_url TEXT,
+  is_active INTEGER DEFAULT 1,
+  position TEXT DEFAULT 'header',
+  starts_at TEXT,
+  ends_at TEXT,
+  target_lat DOUBLE PRECISION,
+  target_lng DOUBLE PRECISION,
+  target_radius_miles DOUBLE PRECISION,
+  ad_account_id BIGINT,
+  cpm_cents INTEGER DEFAULT 0,
+  cpc_cents INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS reel_likes (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  reel_id BIGINT NOT NULL REFERENCES reels (id),
+  user_id BIGINT NOT NULL REFERENCES users (id),
+  created_at TEXT,
+  UNIQUE (reel_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS reel_saves (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  reel_id BIGINT NOT NULL REFERENCES reels (id),
+  user_id BIGINT NOT NULL REFERENCES users (id),
+  created_at TEXT,
+  UNIQUE (reel_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS vendor_likes (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  vendor_id BIGINT NOT NULL REFERENCES vendors (id),
+  user_id BIGINT NOT NULL REFERENCES users (id),
+  created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:MI:SS'),
+  UNIQUE (vendor_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS vendor_saves (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  vendor_id BIGINT NOT NULL REFERENCES vendors (id),
+  user_id BIGINT NOT NULL REFERENCES users (id),
+  created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:MI:SS'),
+  UNIQUE (vendor_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_vendor_likes_user ON vendor_likes (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_vendor_saves_user ON vendor_saves (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_reel_likes_user ON reel_likes (user_id);
+CREATE INDEX IF NOT EXISTS idx_reel_saves_user ON reel_saves (user_id);
+
+CREATE TABLE IF NOT EXISTS vendor_hours (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  vendor_id BIGINT NOT NULL REFERENCES vendors (id),
+  day_of_week INTEGER NOT NULL,  -- 0=Monday ... 6=Sunday
+  open_time TEXT,                -- HH:MM (24h)
+  close_time TEXT,
+  is_closed INTEGER DEFAULT 0,
+  UNIQUE (vendor_id, day_of_week)
+);
+
+-- Append-only impression/click rows and their hourly rollup (see ad_events.py)
+CREATE TABLE IF NOT EXISTS ad_impressions (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  ad_id BIGINT NOT NULL,
+  user_id BIGINT,
+  placement TEXT,
+  cost_cents DOUBLE PRECISION NOT NULL DEFAULT 0,
+  created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ad_clicks (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  ad_id BIGINT NOT NULL,
+  user_id BIGINT,
+  cost_cents DOUBLE PRECISION NOT NULL DEFAULT 0,
+  created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ad_stats_hourly (
+  ad_id BIGINT NOT NULL,
+  hour TEXT NOT NULL,
+  impressions INTEGER NOT NULL DEFAULT 0,
+  clicks INTEGER NOT NULL DEFAULT 0,
+  spend_cents DOUBLE PRECISION NOT NULL DEFAULT 0,
+  PRIMARY KEY (ad_id, hour)
+);
+CREATE INDEX IF NOT EXISTS idx_ad_stats_hourly_hour ON ad_stats_hourly (hour);
+
+-- Delta-encoded GPS trails (see locations.py)
+CREATE TABLE IF NOT EXISTS vendor_location_history (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  vendor_id BIGINT NOT NULL REFERENCES vendors (id),
+  start_ts BIGINT NOT NULL,
+  end_ts BIGINT NOT NULL,
+  lat_e6 INTEGER NOT NULL,
+  lng_e6 INTEGER NOT NULL,
+  points INTEGER NOT NULL,
+  deltas BYTEA NOT NULL,
+  resolution INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_location_history_vendor ON vendor_location_history (vendor_id, start_ts);
+
+-- Background AI jobs and their results by prompt hash (see ai_jobs.py)
+CREATE TABLE IF NOT EXISTS ai_jobs (
+  id TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  prompt_hash TEXT NOT NULL,
+  status TEXT NOT NULL,
+  result TEXT,
+  error TEXT,
+  user_id BIGINT,
+  created_at DOUBLE PRECISION NOT NULL,
+  started_at DOUBLE PRECISION,
+  finished_at DOUBLE PRECISION
+);
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS started_at DOUBLE PRECISION;
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_hash ON ai_jobs (prompt_hash, status);
+
+CREATE TABLE IF NOT EXISTS ai_cache (
+  prompt_hash TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  result TEXT NOT NULL,
+  created_at DOUBLE PRECISION NOT NULL
+);
+
+-- Durable background tasks (see tasks.py)
+CREATE TABLE IF NOT EXISTS tasks (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  name TEXT NOT NULL,
+  payload TEXT NOT NULL DEFAULT '{}',
+  priority INTEGER NOT NULL DEFAULT 0,
+  status TEXT NOT NULL DEFAULT 'queued',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  idempotency_key TEXT,
+  run_at DOUBLE PRECISION NOT NULL,
+  lease_owner TEXT,
+  lease_until DOUBLE PRECISION,
+  last_error TEXT,
+  created_at DOUBLE PRECISION NOT NULL,
+  started_at DOUBLE PRECISION,
+  finished_at DOUBLE PRECISION
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_idempotency ON tasks (idempotency_key);
+CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (priority DESC, run_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_tasks_leases ON tasks (lease_until) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, name);
+CREATE INDEX IF NOT EXISTS idx_tasks_finished ON tasks (finished_at) WHERE finished_at IS NOT NULL;
+
+-- Version stamps for in-process caches; any write to ads bumps 'ads'
+CREATE TABLE IF NOT EXISTS cache_versions (
+  name TEXT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO cache_versions (name, version) VALUES ('ads', 0) ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_ads_version() RETURNS trigger AS $$
+BEGIN
+  UPDATE cache_versions SET version = version + 1 WHERE name = 'ads';
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ads_version ON ads;
+CREATE TRIGGER trg_ads_version AFTER INSERT OR UPDATE OR DELETE ON ads
+  FOR EACH ROW EXECUTE FUNCTION bump_ads_version();
+
+-- Pre-aggregated like/save counts per vendor, kept current by triggers
+CREATE TABLE IF NOT EXISTS vendor_counts (
+  vendor_id BIGINT PRIMARY KEY REFERENCES vendors (id),
+  like_count INTEGER NOT NULL DEFAULT 0,
+  save_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION count_vendor_likes() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO vendor_counts (vendor_id, like_count) VALUES (NEW.vendor_id, 1)
+    ON CONFLICT (vendor_id) DO UPDATE SET like_count = vendor_counts.like_count + 1;
+  ELSE
+    UPDATE vendor_counts SET like_count = like_count - 1 WHERE vendor_id = OLD.vendor_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION count_vendor_saves() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO vendor_counts (vendor_id, save_count) VALUES (NEW.vendor_id, 1)
+    ON CONFLICT (vendor_id) DO UPDATE SET save_count = vendor_counts.save_count + 1;
+  ELSE
+    UPDATE vendor_counts SET save_count = save_count - 1 WHERE vendor_id = OLD.vendor_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_vendor_likes_count ON vendor_likes;
+CREATE TRIGGER trg_vendor_likes_count AFTER INSERT OR DELETE ON vendor_likes
+  FOR EACH ROW EXECUTE FUNCTION count_vendor_likes();
+
+DROP TRIGGER IF EXISTS trg_vendor_saves_count ON vendor_saves;
+CREATE TRIGGER trg_vendor_saves_count AFTER INSERT OR DELETE ON vendor_saves
+  FOR EACH ROW EXECUTE FUNCTION count_vendor_saves();
+
+-- Outbox for cross-worker cache invalidation (invalidation.py): each write to a cached
+-- table records which cache entries (entity, key) it made stale, in the same transaction
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  entity TEXT NOT NULL,
+  key BIGINT NOT NULL,
+  created_at DOUBLE PRECISION NOT NULL DEFAULT extract(epoch FROM now())
+);
+CREATE INDEX IF NOT EXISTS idx_cache_invalidations_created ON cache_invalidations (created_at);
+
+-- TG_ARGV: entity name, key column
+CREATE OR REPLACE FUNCTION publish_invalidation() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO cache_invalidations (entity, key)
+  VALUES (TG_ARGV[0], (to_jsonb(CASE WHEN TG_OP = 'INSERT' THEN NEW ELSE OLD END) ->> TG_ARGV[1])::BIGINT);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_invalidate ON users;
+CREATE TRIGGER trg_users_invalidate AFTER INSERT OR UPDATE OR DELETE ON users
+  FOR EACH ROW EXECUTE FUNCTION publish_invalidation('user', 'id');
+
+DROP TRIGGER IF EXISTS trg_vendors_invalidate ON vendors;
+CREATE TRIGGER trg_vendors_invalidate AFTER INSERT OR UPDATE OR DELETE ON vendors
+  FOR EACH ROW EXECUTE FUNCTION publish_invalidation('vendor', 'id');
+
+DROP TRIGGER IF EXISTS trg_vendor_hours_invalidate ON vendor_hours;
+CREATE TRIGGER trg_vendor_hours_invalidate AFTER INSERT OR UPDATE OR DELETE ON vendor_hours
+  FOR EACH ROW EXECUTE FUNCTION publish_invalidation('vendor_hours', 'vendor_id');
+
+DROP TRIGGER IF EXISTS trg_vendor_likes_invalidate ON vendor_likes;
+CREATE TRIGGER trg_vendor_likes_invalidate AFTER INSERT OR UPDATE OR DELETE ON vendor_likes
+  FOR EACH ROW EXECUTE FUNCTION publish_invalidation('vendor_likes', 'user_id');
+
+DROP TRIGGER IF EXISTS trg_vendor_saves_invalidate ON vendor_saves;
+CREATE TRIGGER trg_vendor_saves_invalidate AFTER INSERT OR UPDATE OR DELETE ON vendor_saves
+  FOR EACH ROW EXECUTE FUNCTION publish_invalidation('vendor_saves', 'user_id');
+
+DROP TRIGGER IF EXISTS trg_reel_likes_invalidate ON reel_likes;
+CREATE TRIGGER trg_reel_likes_invalidate AFTER INSERT OR UPDATE OR DELETE ON reel_likes
+  FOR EACH ROW EXECUTE FUNCTION publish_invalidation('reel_likes', 'user_id');
+
+DROP TRIGGER IF EXISTS trg_reel_saves_invalidate ON reel_saves;
+CREATE TRIGGER trg_reel_saves_invalidate AFTER INSERT OR UPDATE OR DELETE ON reel_saves
+  FOR EACH ROW EXECUTE FUNCTION publish_invalidation('reel_saves', 'user_id');
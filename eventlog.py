@@ -0,0 +1,155 @@
+"""
+Non-blocking structured logging.
+
+emit() drops a dict on a bounded queue and returns immediately; it never
+waits on disk, and when the queue is full the record is counted as dropped
+instead of stalling the request. A background thread drains the queue in
+batches, serializes each record as one JSON line, and appends the batch to
+<directory>/<stream>.jsonl with a single write.
+
+Files rotate at `max_bytes` (stream.jsonl -> stream.jsonl.1 ... .N). Several
+worker processes may share a directory: a writer whose file was rotated by
+another worker notices the inode change and reopens.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+
+class _RotatingFile:
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.fh = None
+
+    def _open(self):
+        self.fh = open(self.path, "ab")
+
+    def _rotate(self):
+        self.fh.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, data):
+        if self.fh is None:
+            self._open()
+        try:
+            if os.stat(self.path).st_ino != os.fstat(self.fh.fileno()).st_ino:
+                raise FileNotFoundError  # rotated by another worker
+        except FileNotFoundError:
+            self.fh.close()
+            self._open()
+        # Real size, not our offset: other workers append to the same file
+        size = os.fstat(self.fh.fileno()).st_size
+        if self.max_bytes and size and size + len(data) > self.max_bytes:
+            self._rotate()
+        self.fh.write(data)
+        self.fh.flush()
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+
+class AsyncJsonLog:
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024, backups=5,
+                 queue_size=10000, batch_size=512, flush_interval=0.5):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = {}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_writer(self):
+        # Writer threads don't survive fork(); each worker starts its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                    self._files = {}
+                    self._thread = threading.Thread(target=self._run, name="eventlog-writer", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def emit(self, stream, record):
+        """Queue `record` for <stream>.jsonl; returns False if it was dropped."""
+        self._ensure_writer()
+        record.setdefault("ts", round(time.time(), 3))
+        try:
+            self._queue.put_nowait((stream, record))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        q = self._queue
+        while True:
+            try:
+                batch = [q.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._write(batch)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        stop = False
+        lines = {}
+        for item in batch:
+            if item is None:
+                stop = True
+                continue
+            stream, record = item
+            lines.setdefault(stream, []).append(json.dumps(record, default=str, separators=(",", ":")))
+        for stream, rows in lines.items():
+            f = self._files.get(stream)
+            if f is None:
+                os.makedirs(self.directory, exist_ok=True)
+                f = self._files[stream] = _RotatingFile(
+                    os.path.join(self.directory, f"{stream}.jsonl"), self.max_bytes, self.backups)
+            try:
+                f.write(("\n".join(rows) + "\n").encode())
+            except OSError:
+                self.dropped += len(rows)
+        if stop:
+            for f in self._files.values():
+                f.close()
+        return stop
+
+    def flush(self):
+        """Block until everything queued so far is on disk (tests, shutdown)."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self, timeout=5):
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
@@ -0,0 +1,169 @@
+"""
+Cross-worker cache invalidation.
+
+Writes to cached tables leave (entity, key) rows in the cache_invalidations
+outbox. Triggers do it (see init_db), so every row commits or rolls back
+with the write itself, whichever worker or script made it.
+
+Each worker runs one InvalidationBus thread. Every `poll_interval` seconds
+it asks SQLite whether any other connection has committed since the last
+look (PRAGMA data_version, answered from the connection's own state when
+nothing changed). Only then does it read the outbox rows after the last
+one it has seen and hand each subscriber the set of keys for its entity.
+
+PostgreSQL has no data_version, and identity values there can commit out
+of order, so without it the outbox is read every poll and rows from the
+last `lag` seconds are read again (and skipped if already seen).
+
+Rows older than `retention` seconds are pruned. A worker that hasn't
+managed to poll for that long may have missed rows, so it tells every
+subscriber to drop everything (keys=None) instead.
+"""
+import os
+import threading
+import time
+
+PAGE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    created_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_invalidations_created ON cache_invalidations (created_at);
+"""
+
+
+def sqlite_triggers(table, entity, column):
+    """SQLite triggers publishing (entity, row.column) for every insert, update and delete on `table`."""
+    return "".join(f"""
+CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_invalidate AFTER {op} ON {table}
+BEGIN
+    INSERT INTO cache_invalidations (entity, key) VALUES ('{entity}', {row}.{column});
+END;
+""" for op, row in (("INSERT", "NEW"), ("UPDATE", "OLD"), ("DELETE", "OLD")))
+
+
+class InvalidationBus:
+    def __init__(self, connect, poll_interval=0.5, retention=3600.0, data_version=True, lag=10.0):
+        """
+        `data_version`: the backend is SQLite, so PRAGMA data_version can gate the outbox read.
+        `lag`: without it, how long a write transaction may take to commit (plus clock skew).
+        """
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.data_version = data_version
+        self.lag = lag
+        self.handlers = {}  # entity -> [callback(keys or None)]
+        self.received = 0
+        self.errors = 0
+        self._db = None
+        self._last_id = None
+        self._recent = {}  # id -> created_at of rows seen inside the lag window
+        self._version = None
+        self._polled_at = None
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def subscribe(self, entity, callback):
+        self.handlers.setdefault(entity, []).append(callback)
+
+    def ensure_running(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # A forked worker starts from the outbox as it is now, on its own connection
+                    self._db, self._last_id, self._version = None, None, None
+                    self._stop = threading.Event()
+                    self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        stop = self._stop
+        while not stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                self.errors += 1
+                self._reset()
+
+    def _reset(self):
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._db.close()
+                except Exception:
+                    pass
+                self._db = None
+
+    def _connection(self):
+        if self._db is None:
+            db = self.connect()
+            db.isolation_level = None  # autocommit: every poll sees the latest commits
+            if self._last_id is None:
+                self._last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM cache_invalidations").fetchone()[0]
+                self._polled_at = time.time()
+            self._version = None
+            self._db = db
+        return self._db
+
+    def _read(self, db, now):
+        if self.data_version:
+            rows, page = [], None
+            while page is None or len(page) == PAGE:
+                page = db.execute(
+                    "SELECT id, entity, key FROM cache_invalidations WHERE id > ? ORDER BY id LIMIT ?",
+                    (rows[-1][0] if rows else self._last_id, PAGE)).fetchall()
+                rows.extend(page)
+            return rows
+
+        cutoff = now - self.lag
+        rows = db.execute(
+            "SELECT id, entity, key, created_at FROM cache_invalidations WHERE id > ? OR created_at > ?",
+            (self._last_id, cutoff)).fetchall()
+        self._recent = {i: t for i, t in self._recent.items() if t > cutoff}
+        fresh = [r for r in rows if r[0] not in self._recent]
+        self._recent.update((r[0], r[3]) for r in fresh if r[3] > cutoff)
+        return fresh
+
+    def poll(self):
+        """Dispatch outbox rows committed since the last poll; returns how many were read."""
+        with self._lock:
+            db = self._connection()
+            now = time.time()
+            missed = now - self._polled_at > self.retention
+            self._polled_at = now
+            if self.data_version and not missed:
+                version = db.execute("PRAGMA data_version").fetchone()[0]
+                if version == self._version:
+                    return 0
+                self._version = version
+
+            keys = {}
+            rows = self._read(db, now)
+            for row in rows:
+                keys.setdefault(row[1], set()).add(row[2])
+                self._last_id = max(self._last_id, row[0])
+            if now - self._pruned_at > 60:
+                db.execute("DELETE FROM cache_invalidations WHERE created_at < ?", (now - self.retention,))
+                self._pruned_at = now
+
+        self.received += len(rows)
+        for entity, callbacks in self.handlers.items():
+            if missed or entity in keys:
+                for callback in callbacks:
+                    callback(None if missed else keys[entity])
+        return len(rows)
+
+    def close(self, timeout=5):
+        if self._pid == os.getpid():
+            self._stop.set()
+            self._thread.join(timeout)
+        self._reset()
@@ -0,0 +1,270 @@
+"""
+GPS ping ingestion for trucks.
+
+PingFilter decides per ping, in memory, what it is worth:
+
+    dropped   too soon after the last accepted ping, or moved less than
+              `min_meters` without the `heartbeat` interval having passed;
+              a ping `move_meters` away from the last one is never dropped
+    history   accepted into the vendor's location trail
+    moved     also written to the vendors row: moved `move_meters` from the
+              position stored there, or the stored one is `heartbeat` old
+
+A manual update (the vendor pressing "update location") skips the filter and
+is always moved. The filter state lives in the worker process: under the
+prefork server each worker thins only the pings it receives, so the trail
+may keep a few more points than one filter would. Decisions to rewrite the
+vendors row start from the position stored there (seed()), which every
+worker reads from the database.
+
+Accepted pings are buffered by LocationHistory and flushed in one
+transaction every `flush_interval` seconds. Each flush appends one row per
+vendor to vendor_location_history: the first point in microdegrees and whole
+seconds, then (dt, dlat, dlng) deltas as zigzag varints -- a few bytes per
+point for a truck moving through town. compact() later merges a vendor's
+older rows per UTC day and thins them to one point per `resolution` seconds.
+"""
+import math
+import os
+import threading
+import time
+
+SCALE = 1_000_000  # microdegrees, ~0.11 m
+
+INSERT_SQL = """
+    INSERT INTO vendor_location_history (vendor_id, start_ts, end_ts, lat_e6, lng_e6, points, deltas, resolution)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
+
+
+def distance_meters(lat1, lng1, lat2, lng2):
+    # Equirectangular approximation; exact enough below a few km
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371000.0 * math.hypot(x, y)
+
+
+# ------------------------------------------------------------------------------
+# Delta encoding
+# ------------------------------------------------------------------------------
+def _put_varint(out, n):
+    n = (n << 1) ^ (n >> 63)  # zigzag: small negatives stay small
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _varints(blob):
+    n = shift = 0
+    for byte in blob:
+        n |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        yield (n >> 1) ^ -(n & 1)
+        n = shift = 0
+
+
+def encode(points):
+    """[(ts, lat, lng), ...] in time order -> (start_ts, lat_e6, lng_e6, deltas blob)."""
+    ts0, lat0, lng0 = int(points[0][0]), round(points[0][1] * SCALE), round(points[0][2] * SCALE)
+    out = bytearray()
+    prev = (ts0, lat0, lng0)
+    for ts, lat, lng in points[1:]:
+        cur = (int(ts), round(lat * SCALE), round(lng * SCALE))
+        for a, b in zip(cur, prev):
+            _put_varint(out, a - b)
+        prev = cur
+    return ts0, lat0, lng0, bytes(out)
+
+
+def decode(start_ts, lat_e6, lng_e6, deltas):
+    ts, lat, lng = start_ts, lat_e6, lng_e6
+    points = [(ts, lat / SCALE, lng / SCALE)]
+    values = _varints(deltas)
+    for dt in values:
+        ts, lat, lng = ts + dt, lat + next(values), lng + next(values)
+        points.append((ts, lat / SCALE, lng / SCALE))
+    return points
+
+
+def downsample(points, resolution):
+    """First point of every `resolution`-second bucket, plus the last point."""
+    kept, bucket = [], None
+    for p in points:
+        if p[0] // resolution != bucket:
+            kept.append(p)
+            bucket = p[0] // resolution
+    if points and kept[-1] is not points[-1]:
+        kept.append(points[-1])
+    return kept
+
+
+def read_trail(db, vendor_id, since, until):
+    rows = db.execute(
+        "SELECT start_ts, lat_e6, lng_e6, deltas FROM vendor_location_history"
+        " WHERE vendor_id=? AND end_ts >= ? AND start_ts <= ? ORDER BY start_ts",
+        (vendor_id, since, until),
+    ).fetchall()
+    return [p for row in rows for p in decode(*row) if since <= p[0] <= until]
+
+
+def compact(db, older_than, resolution):
+    """Merge and thin rows that ended before `older_than` (epoch s); returns (rows before, rows after)."""
+    groups = db.execute(
+        "SELECT vendor_id, start_ts / 86400 AS day, COUNT(*) FROM vendor_location_history"
+        " WHERE end_ts < ? AND resolution < ? GROUP BY vendor_id, day",
+        (older_than, resolution),
+    ).fetchall()
+    before = after = 0
+    for vendor_id, day, count in groups:
+        with db:
+            rows = db.execute(
+                "SELECT id, start_ts, lat_e6, lng_e6, deltas FROM vendor_location_history"
+                " WHERE vendor_id=? AND start_ts / 86400 = ? AND end_ts < ? AND resolution < ?"
+                " ORDER BY start_ts",
+                (vendor_id, day, older_than, resolution),
+            ).fetchall()
+            points = sorted(p for row in rows for p in decode(*row[1:]))
+            points = downsample(points, resolution)
+            db.executemany("DELETE FROM vendor_location_history WHERE id=?", [(row[0],) for row in rows])
+            db.execute(INSERT_SQL, (vendor_id, *_chunk(points), resolution))
+        before += len(rows)
+        after += 1
+    return before, after
+
+
+def _chunk(points):
+    start_ts, lat_e6, lng_e6, deltas = encode(points)
+    return start_ts, int(points[-1][0]), lat_e6, lng_e6, len(points), deltas
+
+
+# ------------------------------------------------------------------------------
+# Thresholding
+# ------------------------------------------------------------------------------
+class PingFilter:
+    DROPPED, HISTORY, MOVED = "dropped", "history", "moved"
+
+    def __init__(self, min_seconds=5, min_meters=15, move_meters=75, heartbeat=300, max_vendors=50000):
+        self.min_seconds = min_seconds
+        self.min_meters = min_meters
+        self.move_meters = move_meters
+        self.heartbeat = heartbeat
+        self.max_vendors = max_vendors
+        self._last = {}    # vendor id -> (ts, lat, lng) of the last accepted ping
+        self._stored = {}  # vendor id -> (ts, lat, lng) last written to the vendors row
+        self._lock = threading.Lock()
+
+    def seed(self, vendor_id, ts, lat, lng):
+        """Start from the position already stored on the vendors row (first ping in this worker)."""
+        with self._lock:
+            if vendor_id not in self._stored and lat is not None and lng is not None:
+                self._stored[vendor_id] = (ts, lat, lng)
+
+    def classify(self, vendor_id, lat, lng, now=None, manual=False):
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._last.get(vendor_id)
+            if last is not None and not manual:
+                elapsed = now - last[0]
+                moved = distance_meters(last[1], last[2], lat, lng)
+                if moved < self.move_meters:
+                    if elapsed < self.min_seconds:
+                        return self.DROPPED
+                    if elapsed < self.heartbeat and moved < self.min_meters:
+                        return self.DROPPED
+            if len(self._last) >= self.max_vendors and vendor_id not in self._last:
+                self._last.clear()
+                self._stored.clear()
+            self._last[vendor_id] = (now, lat, lng)
+            stored = self._stored.get(vendor_id)
+            if (manual or stored is None or now - stored[0] >= self.heartbeat
+                    or distance_meters(stored[1], stored[2], lat, lng) >= self.move_meters):
+                self._stored[vendor_id] = (now, lat, lng)
+                return self.MOVED
+            return self.HISTORY
+
+
+# ------------------------------------------------------------------------------
+# Batched history writes
+# ------------------------------------------------------------------------------
+class LocationHistory:
+    def __init__(self, connect, flush_interval=5.0, max_pending=50000):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.errors = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_flusher(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pending = []
+                    self._stop = threading.Event()
+                    self._thread = threading.Thread(target=self._run, name="location-history", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def add(self, vendor_id, lat, lng, ts=None):
+        self._ensure_flusher()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append((vendor_id, int(time.time() if ts is None else ts), lat, lng))
+        return True
+
+    def _run(self):
+        stop = self._stop
+        while not stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                self.errors += 1
+
+    def flush(self):
+        """Write buffered points, one delta-encoded row per vendor; returns the number of points."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            by_vendor = {}
+            for vendor_id, ts, lat, lng in batch:
+                by_vendor.setdefault(vendor_id, []).append((ts, lat, lng))
+            rows = [(vendor_id, *_chunk(sorted(points)), 0) for vendor_id, points in by_vendor.items()]
+            db = self.connect()
+            try:
+                with db:
+                    db.executemany(INSERT_SQL, rows)
+            except Exception:
+                with self._lock:
+                    room = max(self.max_pending - len(self._pending), 0)
+                    self.dropped += max(len(batch) - room, 0)
+                    self._pending[:0] = batch[:room]
+                raise
+            finally:
+                db.close()
+            return len(batch)
+
+    def close(self, timeout=5):
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception:
+            self.errors += 1
@@ -0,0 +1,359 @@
+"""
+Per-endpoint request metrics in Prometheus text format.
+
+Each request records its latency, status, response size, template render
+time and the number/duration of SQL statements it issued. SQL is measured
+by TimedConnection, a sqlite3 connection whose cursors time every
+execute/fetch call.
+
+The same connection can feed a SlowQueryLog: any statement whose execute +
+fetch time crosses a threshold is recorded with its normalized text, a
+fingerprint of its parameters, the calling route and the EXPLAIN QUERY PLAN
+taken right then.
+
+Metrics are kept per process; under the prefork server each worker
+exposes its own numbers.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+PREFIX = "deliciousroute"
+
+
+class TimedCursor(sqlite3.Cursor):
+    # [sql, params, seconds, log entry] for the current statement while slow-query logging is on
+    _statement = None
+    # Trace span of the current statement while the request is being traced
+    _span = None
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.connection.record(elapsed, count=fn.__name__.startswith("execute"))
+            if self._statement is not None:
+                self._track_statement(elapsed)
+            if self._span is not None:
+                self._span.finish()
+
+    def _track_statement(self, elapsed):
+        stmt = self._statement
+        stmt[2] += elapsed
+        if stmt[3] is not None:
+            # Already logged; keep its duration current as rows are fetched
+            stmt[3]["ms"] = round(stmt[2] * 1000, 3)
+        elif stmt[2] >= self.connection.slow_query_seconds:
+            stmt[3] = self.connection.report_slow_query(stmt[0], stmt[1], stmt[2])
+
+    def _begin(self, sql, parameters):
+        if self.connection.slow_query_log is not None:
+            self._statement = [sql, parameters, 0.0, None]
+        if self.connection.trace is not None:
+            self._span = self.connection.trace.leaf("sqlite", **{"db.statement": normalize_sql(sql)})
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, ())
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection that counts statements and accumulates time spent in SQLite."""
+
+    slow_query_log = None
+    slow_query_seconds = None
+    route = None
+    trace = None  # tracing.Trace of the request, when sampled
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self._slow_entries = []
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute() doesn't go through cursor(), so route it there
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def record(self, seconds, count=True):
+        self.query_seconds += seconds
+        if count:
+            self.query_count += 1
+
+    def enable_slow_query_log(self, log, threshold_seconds, route=None):
+        self.slow_query_log = log
+        self.slow_query_seconds = threshold_seconds
+        self.route = route
+
+    def report_slow_query(self, sql, params, seconds):
+        try:
+            # Plain cursor so the plan lookup isn't timed or logged itself
+            plan = [row[-1] for row in sqlite3.Cursor(self).execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error:
+            plan = []  # DDL, PRAGMA and friends have no plan
+        entry = self.slow_query_log.record(sql, params, seconds, self.route, plan)
+        self._slow_entries.append(entry)
+        return entry
+
+    def close(self):
+        if self._slow_entries:
+            self.slow_query_log.persist(self._slow_entries)
+            self._slow_entries = []
+        super().close()
+
+
+def process_rss_bytes():
+    """
+    Current resident set size of this process; falls back to the peak off Linux
+    and is None where neither is available (Windows has no resource module).
+    """
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        try:
+            import resource
+        except ImportError:
+            return None
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ------------------------------------------------------------------------------
+# Slow-query log
+# ------------------------------------------------------------------------------
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SQL_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SQL_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Literals become ?, IN lists collapse and whitespace is squeezed."""
+    sql = _SQL_STRING.sub("?", sql)
+    sql = _SQL_NUMBER.sub("?", sql)
+    sql = _SQL_IN_LIST.sub("IN (...)", sql)
+    return _SQL_SPACE.sub(" ", sql).strip().rstrip(";")
+
+
+def sql_fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def params_fingerprint(params):
+    """Parameter types plus a short hash of the values; the values themselves aren't kept."""
+    values = list(params.items()) if isinstance(params, dict) else list(params or ())
+    types = ",".join(type(v[-1] if isinstance(params, dict) else v).__name__ for v in values)
+    digest = hashlib.sha1(repr(values).encode()).hexdigest()[:8]
+    return f"{types}#{digest}" if values else ""
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of slow statements, optionally appended to a JSON-lines file."""
+
+    def __init__(self, size=500, path=None, max_bytes=10 * 1024 * 1024):
+        self.size = size
+        self.path = path
+        self.max_bytes = max_bytes
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, sql, params, seconds, route, plan):
+        normalized = normalize_sql(sql)
+        entry = {
+            "ts": time.time(),
+            "fingerprint": sql_fingerprint(normalized),
+            "sql": normalized,
+            "params": params_fingerprint(params),
+            "ms": round(seconds * 1000, 3),
+            "route": route,
+            "plan": plan,
+            "pid": os.getpid(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+        return entry
+
+    def persist(self, entries):
+        """Append finished entries to the log file (called when their connection closes)."""
+        if not self.path:
+            return
+        lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except OSError:
+                pass
+            with open(self.path, "a") as fh:
+                fh.write(lines)
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def read_slow_query_file(path, size=500):
+    """Last `size` entries from a log file and its rotated predecessor."""
+    entries = deque(maxlen=size)
+    for name in (path + ".1", path):
+        try:
+            with open(name) as fh:
+                for line in fh:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # torn write from a killed worker
+        except FileNotFoundError:
+            continue
+    return list(entries)
+
+
+def aggregate_slow_queries(entries):
+    """Group entries by statement fingerprint, worst total time first."""
+    groups = {}
+    for e in entries:
+        agg = groups.get(e["fingerprint"])
+        if agg is None:
+            agg = groups[e["fingerprint"]] = {
+                "fingerprint": e["fingerprint"], "sql": e["sql"], "count": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "routes": [], "plan": e["plan"],
+            }
+        agg["count"] += 1
+        agg["total_ms"] += e["ms"]
+        if e["ms"] >= agg["max_ms"]:
+            agg["max_ms"] = e["ms"]
+            agg["plan"] = e["plan"]
+        if e["route"] not in agg["routes"]:
+            agg["routes"].append(e["route"])
+    for agg in groups.values():
+        agg["total_ms"] = round(agg["total_ms"], 3)
+        agg["mean_ms"] = round(agg["total_ms"] / agg["count"], 3)
+    return sorted(groups.values(), key=lambda a: a["total_ms"], reverse=True)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}          # (endpoint, method, status) -> count
+        self.latency = {}           # (endpoint, method) -> Histogram
+        self.sql_queries = {}       # endpoint -> Histogram of statements per request
+        self.sql_seconds = {}       # endpoint -> total seconds
+        self.template_seconds = {}  # endpoint -> total seconds
+        self.response_bytes = {}    # endpoint -> Histogram
+
+    def observe_request(self, endpoint, method, status, seconds, sql_count=0,
+                        sql_seconds=0.0, template_seconds=0.0, response_bytes=None):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault((endpoint, method), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.sql_queries.setdefault(endpoint, Histogram(QUERY_COUNT_BUCKETS)).observe(sql_count)
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + sql_seconds
+            self.template_seconds[endpoint] = self.template_seconds.get(endpoint, 0.0) + template_seconds
+            if response_bytes is not None:
+                self.response_bytes.setdefault(endpoint, Histogram(SIZE_BUCKETS)).observe(response_bytes)
+
+    def render(self, extra=()):
+        """Prometheus text exposition; `extra` yields (name, type, help, [(labels, value)])."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        def histogram(name, labels, hist):
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'{PREFIX}_{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{PREFIX}_{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+            lines.append(f"{PREFIX}_{name}_sum{{{labels}}} {hist.sum}")
+            lines.append(f"{PREFIX}_{name}_count{{{labels}}} {hist.count}")
+
+        with self._lock:
+            family("requests_total", "counter", "HTTP requests by endpoint, method and status.")
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f"{PREFIX}_requests_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}")
+
+            family("request_duration_seconds", "histogram", "Request latency.")
+            for (endpoint, method), hist in sorted(self.latency.items()):
+                histogram("request_duration_seconds", _labels(endpoint=endpoint, method=method), hist)
+
+            family("sql_queries_per_request", "histogram", "SQL statements issued per request.")
+            for endpoint, hist in sorted(self.sql_queries.items()):
+                histogram("sql_queries_per_request", _labels(endpoint=endpoint), hist)
+
+            family("sql_seconds_total", "counter", "Time spent executing SQL and fetching rows.")
+            for endpoint, seconds in sorted(self.sql_seconds.items()):
+                lines.append(f"{PREFIX}_sql_seconds_total{{{_labels(endpoint=endpoint)}}} {seconds}")
+
+            family("template_render_seconds_total", "counter", "Time spent rendering Jinja templates.")
+            for endpoint, seconds in sorted(self.template_seconds.items()):
+                lines.append(f"{PREFIX}_template_render_seconds_total{{{_labels(endpoint=endpoint)}}} {seconds}")
+
+            family("response_size_bytes", "histogram", "Response body size.")
+            for endpoint, hist in sorted(self.response_bytes.items()):
+                histogram("response_size_bytes", _labels(endpoint=endpoint), hist)
+
+        for name, kind, help_text, samples in extra:
+            family(name, kind, help_text)
+            for labels, value in samples:
+                lines.append(f"{PREFIX}_{name}{{{_labels(**labels)}}} {value}" if labels
+                             else f"{PREFIX}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
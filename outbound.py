@@ -0,0 +1,198 @@
+"""
+Shared client for outbound HTTP calls (geocoding, OpenAI, ...).
+
+Every third-party dependency is registered as a named service with its own
+base URL, timeouts and retry budget. Calls go through one requests.Session
+per process, so connections are kept alive and pooled per host. Each
+service also gets its own circuit breaker:
+
+    closed      calls go through; `failure_threshold` consecutive failures
+                (connection errors, timeouts, 5xx) open the circuit
+    open        calls fail immediately with CircuitOpen for `reset_timeout`
+                seconds
+    half-open   one trial call is let through; success closes the circuit,
+                failure opens it again
+
+Idempotent requests (GET/HEAD) are retried on failure with full-jitter
+exponential backoff; other methods only when the caller passes retry=True.
+Retries stop at the service's `deadline`, and every attempt's connect/read
+timeouts are capped by what is left of it, so a slow dependency can't pin a
+worker thread indefinitely.
+"""
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+IDEMPOTENT = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class UpstreamError(Exception):
+    """A service call failed after retries (or was refused by an open circuit)."""
+
+    def __init__(self, service, message):
+        super().__init__(f"{service}: {message}")
+        self.service = service
+
+
+class CircuitOpen(UpstreamError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state, self._trial = self.HALF_OPEN, False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial:
+                self._trial = True  # exactly one caller probes the dependency
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self._trial = self.CLOSED, 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state, self.opened_at, self._trial = self.OPEN, self.clock(), False
+
+
+class Service:
+    def __init__(self, name, base_url, connect_timeout=2.0, timeout=5.0, deadline=None, retries=1,
+                 backoff=0.2, max_backoff=2.0, failure_threshold=5, reset_timeout=30.0, headers=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout  # read timeout per attempt
+        self.deadline = deadline or timeout * (retries + 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.headers = headers or {}
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+
+class OutboundClient:
+    def __init__(self, services, pool_size=10, user_agent="DeliciousRoute/1.0", span=None):
+        """`services`: name -> Service kwargs; `span(**attrs)` returns a context manager (tracing)."""
+        self.services = {name: Service(name, **opts) for name, opts in services.items()}
+        self.pool_size = pool_size
+        self.user_agent = user_agent
+        self.span = span
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        # Pooled sockets must not be shared with forked workers
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=max(len(self.services), 1),
+                                          pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers["User-Agent"] = self.user_agent
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+    def request(self, service, method, path, retry=None, **kwargs):
+        """
+        Call `service`; returns the requests.Response for any status that isn't
+        retried. Raises CircuitOpen while the circuit is open and UpstreamError
+        once retries or the deadline are used up.
+        """
+        import requests
+
+        svc = self.services[service]
+        method = method.upper()
+        retry = method in IDEMPOTENT if retry is None else retry
+        attempts = svc.retries + 1 if retry else 1
+        url = path if path.startswith(("http://", "https://")) else f"{svc.base_url}/{path.lstrip('/')}"
+        headers = {**svc.headers, **(kwargs.pop("headers", None) or {})}
+        give_up_at = time.monotonic() + svc.deadline
+        error = None
+
+        for attempt in range(attempts):
+            if not svc.breaker.allow():
+                svc.rejected += 1
+                raise CircuitOpen(service, "circuit open")
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            svc.calls += 1
+            span = self.span(**{"http.method": method, "http.url": url, "peer.service": service,
+                                "attempt": attempt}) if self.span else nullcontext()
+            try:
+                with span as s:
+                    response = self.session().request(
+                        method, url, headers=headers,
+                        timeout=(min(svc.connect_timeout, remaining), min(svc.timeout, remaining)), **kwargs)
+                    if s is not None:
+                        s.attributes["http.status_code"] = response.status_code
+            except requests.RequestException as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code < 500 and response.status_code not in RETRY_STATUSES:
+                    svc.breaker.record_success()
+                    return response
+                error = f"HTTP {response.status_code}"
+                if response.status_code == 429:
+                    # The dependency is up, just busy; that doesn't count against the circuit
+                    svc.breaker.record_success()
+                    if attempt + 1 == attempts:
+                        return response
+                    svc.failures += 1
+                    self._sleep(svc, attempt, give_up_at)
+                    continue
+                response.close()
+            svc.failures += 1
+            svc.breaker.record_failure()
+            if attempt + 1 < attempts:
+                self._sleep(svc, attempt, give_up_at)
+        raise UpstreamError(service, error or "deadline exceeded")
+
+    @staticmethod
+    def _sleep(svc, attempt, give_up_at):
+        # Full jitter: spreads retries from many workers instead of synchronizing them
+        delay = random.uniform(0, min(svc.max_backoff, svc.backoff * 2 ** attempt))
+        time.sleep(max(min(delay, give_up_at - time.monotonic()), 0))
+
+    def get(self, service, path, **kwargs):
+        return self.request(service, "GET", path, **kwargs)
+
+    def post(self, service, path, **kwargs):
+        return self.request(service, "POST", path, **kwargs)
+
+    def stats(self):
+        return {
+            name: {"state": svc.breaker.state, "calls": svc.calls, "failures": svc.failures,
+                   "rejected": svc.rejected}
+            for name, svc in self.services.items()
+        }
@@ -0,0 +1,83 @@
+"""
+Password hashing off the request thread.
+
+Hashing and verifying passwords is deliberately slow CPU work. Running it
+inline lets a login burst (or a credential-stuffing run) starve every other
+endpoint, so it goes through a small process pool instead. The number of
+jobs waiting for the pool is capped: when the cap is reached callers get
+HasherBusy straight away rather than queueing behind the burst. A job
+keeps its slot until it has actually finished, even if its caller gave up
+waiting after `timeout` seconds (and got HasherBusy too).
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashing jobs are already pending, or one took longer than the timeout."""
+
+
+class PasswordHasher:
+    def __init__(self, method="scrypt:32768:8:1", workers=2, max_pending=8, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._prefix = None
+
+    def _pool(self):
+        # A pool inherited across fork is unusable, so each process builds its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy() from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if `pwhash` was made with different cost parameters."""
+        if self._prefix is None:
+            # werkzeug fills in defaults ("pbkdf2:sha256" -> "pbkdf2:sha256:600000"), so
+            # compare against what it actually writes rather than the configured string
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,56 @@
+"""
+Report per-module import cost for the app (cold start profiling).
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter and
+prints the most expensive modules by self and cumulative time.
+
+    python profile_startup.py --top 25
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_profile(module="app"):
+    """[(module, self_seconds, cumulative_seconds)] for importing `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return rows
+
+
+def import_seconds(module="app"):
+    """Cumulative import time of `module` itself."""
+    for name, _, cumulative in import_profile(module):
+        if name == module:
+            return cumulative
+    raise LookupError(f"{module} not found in import profile")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", choices=("self", "cumulative"), default="self")
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    key = 1 if args.sort == "self" else 2
+    print(f"{'self ms':>10} {'cumul ms':>10}  module")
+    for name, self_s, cumulative_s in sorted(rows, key=lambda r: r[key], reverse=True)[:args.top]:
+        print(f"{self_s * 1000:10.1f} {cumulative_s * 1000:10.1f}  {name}")
+    print(f"\nimport {args.module}: {import_seconds(args.module) * 1000:.1f} ms total")
+
+
+if __name__ == "__main__":
+    main()
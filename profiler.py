@@ -0,0 +1,206 @@
+"""
+Per-request CPU profiles in collapsed-stack ("folded") format.
+
+Each output line is `frame;frame;frame weight`, which flamegraph.pl,
+speedscope and inferno read directly. Two modes:
+
+    sample   a helper thread snapshots the request thread's stack every
+             `interval` seconds; weights are sample counts
+    trace    sys.setprofile sees every call and return on the request
+             thread; weights are microseconds of self time
+
+Profiles are written to a directory that keeps at most `max_files` of them.
+
+The memory helpers at the bottom wrap tracemalloc: start tracing, take named
+snapshots, and report top allocation sites or the diff between two
+snapshots. Like the profiles, all state is per worker process.
+"""
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+
+MODES = ("sample", "trace")
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.counts = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+
+class TracingProfiler:
+    def __init__(self):
+        self.counts = Counter()
+        self._stack = []
+        self._last = 0
+
+    def start(self):
+        self._last = time.perf_counter_ns()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(None)
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter_ns()
+        stack = self._stack
+        if stack:
+            self.counts[";".join(stack)] += (now - self._last) // 1000
+        if event == "call":
+            stack.append(_label(frame.f_code))
+        elif event == "c_call":
+            stack.append(f"{getattr(arg, '__qualname__', arg)} (builtin)")
+        elif stack:
+            # Returns from frames entered before start() arrive with an empty stack
+            stack.pop()
+        self._last = time.perf_counter_ns()
+
+
+def start_profile(mode, interval=0.001):
+    profiler = TracingProfiler() if mode == "trace" else SamplingProfiler(interval)
+    profiler.start()
+    return profiler
+
+
+def _safe(text):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", text or "unmatched")[:60]
+
+
+def save_profile(profiler, directory, endpoint, mode, max_files=50):
+    """Write the folded stacks and prune the oldest profiles; returns the file name."""
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 1_000_000:06d}-{_safe(endpoint)}-{mode}.folded"
+    with open(os.path.join(directory, name), "w") as fh:
+        for stack, weight in profiler.counts.most_common():
+            if weight:
+                fh.write(f"{stack} {weight}\n")
+
+    profiles = list_profiles(directory)
+    for old in profiles[max_files:]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass  # another worker pruned it first
+    return name
+
+
+def list_profiles(directory):
+    """Profile file names, newest first."""
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith(".folded")]
+    except FileNotFoundError:
+        return []
+    return sorted(names, reverse=True)
+
+
+# ------------------------------------------------------------------------------
+# Memory snapshots (tracemalloc)
+# ------------------------------------------------------------------------------
+GROUP_BY = ("lineno", "filename", "traceback")
+
+_snapshots = OrderedDict()  # name -> (taken_at, Snapshot)
+_snapshot_lock = threading.Lock()
+
+# tracemalloc's own bookkeeping and import machinery are noise in every diff
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def memory_status():
+    current, peak = tracemalloc.get_traced_memory()
+    with _snapshot_lock:
+        snapshots = [{"name": n, "taken_at": t} for n, (t, _) in _snapshots.items()]
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "snapshots": snapshots,
+    }
+
+
+def start_tracing(frames=1):
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    tracemalloc.start(frames)
+
+
+def stop_tracing():
+    """Stop tracing and drop snapshots (they hold every traced block)."""
+    tracemalloc.stop()
+    with _snapshot_lock:
+        _snapshots.clear()
+
+
+def take_snapshot(name, keep=10):
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not tracing; start it first")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+    with _snapshot_lock:
+        _snapshots.pop(name, None)
+        _snapshots[name] = (time.time(), snapshot)
+        while len(_snapshots) > keep:
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def get_snapshot(name):
+    with _snapshot_lock:
+        entry = _snapshots.get(name)
+    if entry is None:
+        raise KeyError(name)
+    return entry[1]
+
+
+def _site(stat, group_by):
+    if group_by == "traceback":
+        return [str(frame) for frame in stat.traceback]
+    return str(stat.traceback[0])
+
+
+def top_allocations(snapshot, group_by="lineno", limit=25):
+    return [
+        {"site": _site(stat, group_by), "size_bytes": stat.size, "count": stat.count}
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+
+def diff_snapshots(old, new, group_by="lineno", limit=25):
+    """Allocation sites that grew the most between `old` and `new`."""
+    return [
+        {"site": _site(stat, group_by), "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff,
+         "size_bytes": stat.size, "count": stat.count}
+        for stat in new.compare_to(old, group_by)[:limit]
+    ]
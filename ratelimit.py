@@ -0,0 +1,146 @@
+"""
+Token-bucket rate limiting.
+
+A limit like "30/minute burst 10" refills 30 tokens per minute into a bucket
+holding at most 10 (burst defaults to the count); every request takes one
+token and is refused while the bucket is empty, with the number of seconds
+until the next token as Retry-After.
+
+Buckets live in one of two stores:
+
+    MemoryStore   per process; cheap, but each worker enforces its own limit
+    SQLiteStore   a small SQLite file shared by every worker on the host;
+                  each take() is one UPSERT ... RETURNING statement
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LIMIT = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day|s)\s*(?:burst\s+(\d+))?\s*$")
+
+
+class Limit:
+    __slots__ = ("rate", "burst", "text")
+
+    def __init__(self, rate, burst, text=""):
+        self.rate = rate      # tokens per second
+        self.burst = burst    # bucket size
+        self.text = text
+
+
+def parse_limit(text):
+    """'30/minute', '5/10s burst 2', ... -> Limit; raises ValueError."""
+    m = _LIMIT.match(text or "")
+    if not m:
+        raise ValueError(f"bad rate limit {text!r}; expected e.g. '30/minute burst 10'")
+    count, n, unit, burst = m.groups()
+    seconds = int(n or 1) * (1 if unit == "s" else PERIODS[unit])
+    count = int(count)
+    if count < 1:
+        raise ValueError("rate limit count must be positive")
+    return Limit(count / seconds, int(burst) if burst else count, text.strip())
+
+
+def _refill(tokens, updated, now, limit):
+    return min(float(limit.burst), tokens + max(now - updated, 0.0) * limit.rate)
+
+
+def _retry_after(tokens, limit):
+    return max((1 - tokens) / limit.rate, 0.0)
+
+
+class MemoryStore:
+    def __init__(self, max_keys=100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        """(allowed, tokens left, seconds until the next token)."""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = float(limit.burst) if bucket is None else _refill(bucket[0], bucket[1], now, limit)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = [tokens, now]
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)  # least recently seen; a fresh bucket is full anyway
+        return allowed, tokens, 0.0 if allowed else _retry_after(tokens, limit)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStore:
+    # Refill and take in one statement so concurrent workers can't both spend the last token
+    TAKE_SQL = """
+        INSERT INTO rate_limits (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1)
+        ON CONFLICT(key) DO UPDATE SET
+            allowed = MIN(:burst, tokens + MAX(:now - updated, 0) * :rate) >= 1,
+            tokens = MIN(:burst, tokens + MAX(:now - updated, 0) * :rate)
+                     - (MIN(:burst, tokens + MAX(:now - updated, 0) * :rate) >= 1),
+            updated = :now
+        RETURNING allowed, tokens
+    """
+
+    def __init__(self, path, clock=time.time, prune_every=10000):
+        self.path = path
+        self.clock = clock  # wall clock: shared across processes
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._takes = 0
+        self._ready = False
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # Buckets are disposable: losing the last writes in a crash only refills them early
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            if not self._ready:
+                db.execute("CREATE TABLE IF NOT EXISTS rate_limits ("
+                           "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER)")
+                self._ready = True
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def take(self, key, limit):
+        db = self._connect()
+        now = self.clock()
+        allowed, tokens = db.execute(self.TAKE_SQL, {
+            "key": key, "burst": float(limit.burst), "rate": limit.rate, "now": now,
+        }).fetchone()
+        self._takes += 1
+        if self._takes % self.prune_every == 0:
+            # Buckets idle for a day are full again; dropping them changes nothing
+            db.execute("DELETE FROM rate_limits WHERE updated < ?", (now - 86400,))
+        return bool(allowed), tokens, 0.0 if allowed else _retry_after(tokens, limit)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM rate_limits")
+
+
+class RateLimiter:
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = {name: parse_limit(text) for name, text in limits.items()}
+        self.rejected = {}  # limit name -> count, this process
+
+    def hit(self, name, identity):
+        """Take a token for `identity` under limit `name`: (allowed, limit, remaining, retry_after)."""
+        limit = self.limits[name]
+        allowed, tokens, retry_after = self.store.take(f"{name}:{identity}", limit)
+        if not allowed:
+            self.rejected[name] = self.rejected.get(name, 0) + 1
+        return allowed, limit, int(tokens), retry_after
@@ -0,0 +1,146 @@
+"""
+Recurring event expansion.
+
+Rules use a small subset of RFC 5545 RRULE syntax:
+
+    FREQ=DAILY|WEEKLY|MONTHLY   required
+    INTERVAL=n                  every n days/weeks/months (default 1)
+    BYDAY=MO,WE,SA              weekly only; defaults to the first start's weekday
+    UNTIL=YYYY-MM-DD[ HH:MM]    last possible start (inclusive)
+    COUNT=n                     total number of occurrences
+
+e.g. a Saturday market: "FREQ=WEEKLY;BYDAY=SA;UNTIL=2026-12-31".
+
+Occurrences are expanded lazily. OccurrenceCache keeps, per event, the
+occurrences of a window at least `horizon` long and only re-expands when a
+request reaches past it or the event's definition changes.
+"""
+import threading
+from bisect import bisect_left
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+FREQS = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# Safety net for rules without UNTIL/COUNT and very wide windows
+MAX_OCCURRENCES = 5000
+
+
+def parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip().replace("Z", "")).replace(tzinfo=None)
+
+
+def parse_rule(text):
+    """RRULE subset -> dict; raises ValueError on anything unsupported."""
+    rule = {"interval": 1, "byday": None, "until": None, "count": None}
+    parts = dict(p.split("=", 1) for p in text.upper().replace("RRULE:", "").split(";") if "=" in p)
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQS:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQS)}")
+    rule["freq"] = freq
+    if "INTERVAL" in parts:
+        rule["interval"] = int(parts.pop("INTERVAL"))
+        if rule["interval"] < 1:
+            raise ValueError("INTERVAL must be positive")
+    if "BYDAY" in parts:
+        days = parts.pop("BYDAY").split(",")
+        if freq != "WEEKLY" or any(d not in WEEKDAYS for d in days):
+            raise ValueError("BYDAY needs FREQ=WEEKLY and MO..SU")
+        rule["byday"] = sorted(WEEKDAYS.index(d) for d in days)
+    if "UNTIL" in parts:
+        until = parts.pop("UNTIL")
+        if len(until) == 8 and until.isdigit():  # RFC form 20261231
+            until = f"{until[:4]}-{until[4:6]}-{until[6:]}"
+        until = parse_datetime(until)
+        rule["until"] = until.replace(hour=23, minute=59, second=59) if until.time() == datetime.min.time() else until
+    if "COUNT" in parts:
+        rule["count"] = int(parts.pop("COUNT"))
+    if parts:
+        raise ValueError(f"unsupported rule parts: {', '.join(parts)}")
+    return rule
+
+
+def _starts(first, rule):
+    """Every occurrence start in order, from the first one on (unbounded unless UNTIL/COUNT)."""
+    n = 0
+    freq, interval = rule["freq"], rule["interval"]
+    if freq == "WEEKLY":
+        days = rule["byday"] or [first.weekday()]
+        week = first - timedelta(days=first.weekday())
+        while True:
+            for day in days:
+                start = week + timedelta(days=day)
+                if start < first:
+                    continue
+                yield start
+                n += 1
+            week += timedelta(weeks=interval)
+    elif freq == "DAILY":
+        while True:
+            yield first + timedelta(days=n * interval)
+            n += 1
+    else:
+        months = 0
+        while True:
+            year, month = divmod(first.month - 1 + months, 12)
+            year += first.year
+            # Skip months that don't have this day (e.g. the 31st)
+            if first.day <= monthrange(year, month + 1)[1]:
+                yield first.replace(year=year, month=month + 1)
+            months += interval
+
+
+def expand(first_start, first_end, rule, window_from, window_to):
+    """(start, end) pairs of occurrences overlapping [window_from, window_to)."""
+    duration = (first_end - first_start) if first_end else timedelta(0)
+    out = []
+    for i, start in enumerate(_starts(first_start, rule)):
+        if rule["count"] is not None and i >= rule["count"]:
+            break
+        if rule["until"] is not None and start > rule["until"]:
+            break
+        if start >= window_to or len(out) >= MAX_OCCURRENCES:
+            break
+        if start + duration >= window_from:
+            out.append((start, start + duration))
+    return out
+
+
+class OccurrenceCache:
+    """Per-event cached expansion over a sliding window of at least `horizon`."""
+
+    def __init__(self, horizon=timedelta(days=90), size=4096):
+        self.horizon = horizon
+        self.size = size
+        self._entries = OrderedDict()  # event id -> (signature, from, to, starts, occurrences)
+        self._lock = threading.Lock()
+
+    def occurrences(self, event_id, start_time, end_time, rule_text, window_from, window_to):
+        signature = (start_time, end_time, rule_text)
+        with self._lock:
+            entry = self._entries.get(event_id)
+            if entry is not None and entry[0] == signature and entry[1] <= window_from and window_to <= entry[2]:
+                self._entries.move_to_end(event_id)
+                _, _, _, starts, occ = entry
+                # Overlap test on ends: back off by the (constant) duration
+                i = bisect_left(starts, window_from - (occ[0][1] - occ[0][0])) if occ else 0
+                return [o for o in occ[i:] if o[0] < window_to and o[1] >= window_from]
+
+        cover_from = window_from
+        cover_to = max(window_to, window_from + self.horizon)
+        occ = expand(parse_datetime(start_time), parse_datetime(end_time) if end_time else None,
+                     parse_rule(rule_text), cover_from, cover_to)
+        with self._lock:
+            self._entries[event_id] = (signature, cover_from, cover_to, [o[0] for o in occ], occ)
+            self._entries.move_to_end(event_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return [o for o in occ if o[0] < window_to and o[1] >= window_from]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,187 @@
+"""
+Prefork production server.
+
+The master process binds the listening socket and forks `workers` children.
+Each child serves requests from the shared socket with a fixed-size thread
+pool. Signals sent to the master:
+
+    SIGHUP           replace every worker; old workers finish their
+                     in-flight requests before exiting. New workers are
+                     forked from the master, so they run the code and
+                     config it imported: restart the master to pick up
+                     new code or environment
+    SIGTERM/SIGINT   stop accepting, drain in-flight requests, exit
+
+Workers are forked from the master's already-imported app, so anything that
+must happen once (migrations) should run before calling serve(). Workers
+leave through os._exit(), which skips atexit; pass `on_worker_exit` for
+cleanup such as flushing log queues.
+"""
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles requests on a bounded thread pool."""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=8, **kwargs):
+        super().__init__(host, port, app, **kwargs)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        future = self._pool.submit(self._handle, request, client_address)
+        with self._lock:
+            self._in_flight.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self._lock:
+            self._in_flight.discard(future)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self, timeout):
+        """Wait up to `timeout` seconds for in-flight requests to finish."""
+        with self._lock:
+            pending = list(self._in_flight)
+        wait(pending, timeout=timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_worker(app, listener, threads, graceful_timeout, on_worker_exit=None):
+    host, port = listener.getsockname()[:2]
+    server = PooledWSGIServer(
+        host, port, app, threads=threads, handler=WSGIRequestHandler, fd=listener.fileno()
+    )
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever() returns, so call it off the main thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server.serve_forever()
+    server.drain(graceful_timeout)
+    if on_worker_exit is not None:
+        on_worker_exit()
+
+
+class Master:
+    def __init__(self, app, host, port, workers, threads, graceful_timeout, on_worker_exit=None):
+        self.app = app
+        self.on_worker_exit = on_worker_exit
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.children = {}  # pid -> generation
+        self.generation = 0
+        self.stopping = False
+        self.reload = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(self.app, self.listener, self.threads, self.graceful_timeout,
+                            self.on_worker_exit)
+            except Exception:
+                code = 1
+                sys.excepthook(*sys.exc_info())
+            finally:
+                os._exit(code)
+        self.children[pid] = self.generation
+
+    def signal_children(self, sig, generation=None):
+        for pid, gen in list(self.children.items()):
+            if generation is None or gen == generation:
+                try:
+                    os.kill(pid, sig)
+                except ProcessLookupError:
+                    pass
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            self.children.pop(pid, None)
+
+    def run(self):
+        self.listener = socket.create_server((self.host, self.port), backlog=2048)
+        self.listener.set_inheritable(True)
+        print(f" * Serving on http://{self.host}:{self.port} "
+              f"({self.workers} workers x {self.threads} threads, pid {os.getpid()})")
+
+        def on_stop(signum, frame):
+            self.stopping = True
+
+        def on_reload(signum, frame):
+            self.reload = True
+
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGHUP, on_reload)
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        while not self.stopping:
+            if self.reload:
+                # New generation first so the socket never goes unserved
+                self.reload = False
+                old = self.generation
+                self.generation += 1
+                for _ in range(self.workers):
+                    self.spawn()
+                self.signal_children(signal.SIGTERM, generation=old)
+
+            self.reap()
+            alive = sum(1 for gen in self.children.values() if gen == self.generation)
+            for _ in range(self.workers - alive):
+                self.spawn()
+            time.sleep(0.2)
+
+        self.signal_children(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 1
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.signal_children(signal.SIGKILL)
+        for pid in list(self.children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.children.clear()
+        self.listener.close()
+
+
+def serve(app, host="127.0.0.1", port=8000, workers=2, threads=8, graceful_timeout=30,
+          on_worker_exit=None):
+    Master(app, host, port, workers, threads, graceful_timeout, on_worker_exit).run()
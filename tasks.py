@@ -0,0 +1,270 @@
+"""
+Durable background tasks in SQLite.
+
+enqueue() inserts a row through the caller's connection and does not
+commit, so a task becomes visible exactly when the request's own write
+commits (and vanishes with it on rollback). Tasks with an idempotency key
+are inserted at most once per key; enqueueing again returns the existing
+task.
+
+Workers claim the highest-priority task that is due with a single
+UPDATE ... RETURNING, which also takes a lease. While a task runs, a
+heartbeat keeps extending the lease. If a worker dies, its lease runs out
+and another worker reclaims the task, or marks it failed if it has used up
+its attempts (so a task that kills its worker can't crash-loop the pool).
+A failed task is retried with exponential backoff and jitter until it has
+been attempted `max_attempts` times, then it stays `failed` with its last
+error.
+
+`run_workers` forks N worker processes and restarts any that exit; SIGTERM
+lets every worker finish its current task first. Workers leave through
+os._exit(), so pass `on_exit` for cleanup such as flushing log queues.
+"""
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        payload TEXT NOT NULL DEFAULT '{}',
+        priority INTEGER NOT NULL DEFAULT 0,      -- higher runs first
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        idempotency_key TEXT,
+        run_at REAL NOT NULL,                     -- not before (epoch seconds)
+        lease_owner TEXT,
+        lease_until REAL,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_idempotency ON tasks (idempotency_key);
+    CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (priority DESC, run_at) WHERE status = 'queued';
+    CREATE INDEX IF NOT EXISTS idx_tasks_leases ON tasks (lease_until) WHERE status = 'running';
+    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, name);
+    CREATE INDEX IF NOT EXISTS idx_tasks_finished ON tasks (finished_at) WHERE finished_at IS NOT NULL;
+"""
+
+CLAIM_SQL = """
+    UPDATE tasks SET status = 'running', attempts = attempts + 1, lease_owner = :owner,
+                     lease_until = :now + :lease, started_at = :now
+    WHERE id = (SELECT id FROM tasks WHERE status = 'queued' AND run_at <= :now AND attempts < max_attempts
+                ORDER BY priority DESC, run_at, id LIMIT 1)
+    RETURNING id, name, payload, attempts, max_attempts
+"""
+
+
+def enqueue(db, name, payload=None, priority=0, delay=0, max_attempts=5, idempotency_key=None):
+    """Add a task in the caller's transaction; returns its id (the existing one for a repeated key)."""
+    now = time.time()
+    rows = db.execute(
+        "INSERT INTO tasks (name, payload, priority, max_attempts, idempotency_key, run_at, created_at)"
+        " VALUES (?,?,?,?,?,?,?) ON CONFLICT(idempotency_key) DO NOTHING RETURNING id",
+        (name, json.dumps(payload or {}), priority, max_attempts, idempotency_key, now + delay, now),
+    ).fetchall()
+    if rows:
+        return rows[0][0]
+    return db.execute("SELECT id FROM tasks WHERE idempotency_key=?", (idempotency_key,)).fetchone()[0]
+
+
+def retry_delay(attempts, base=5.0, cap=3600.0):
+    """Exponential backoff with jitter for the retry after `attempts` tries."""
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def queue_stats(db, window=300):
+    """Depth per (name, status), age of the oldest due task, and recent wait/run times per name."""
+    now = time.time()
+    depth = [tuple(r) for r in db.execute(
+        "SELECT name, status, COUNT(*) FROM tasks WHERE status IN (?, ?, ?) GROUP BY name, status",
+        (QUEUED, RUNNING, FAILED))]
+    oldest = db.execute("SELECT MIN(run_at) FROM tasks WHERE status = ? AND run_at <= ?", (QUEUED, now)).fetchone()[0]
+    recent = [tuple(r) for r in db.execute(
+        "SELECT name, COUNT(*), AVG(started_at - run_at), AVG(finished_at - started_at) FROM tasks"
+        " WHERE finished_at >= ? AND status = ? GROUP BY name", (now - window, DONE))]
+    return {
+        "depth": depth,
+        "oldest_due_seconds": round(now - oldest, 3) if oldest else 0.0,
+        "recent": [{"name": n, "count": c, "avg_wait_seconds": round(w or 0, 3), "avg_run_seconds": round(r or 0, 3)}
+                   for n, c, w, r in recent],
+    }
+
+
+class Worker:
+    def __init__(self, connect, handlers, lease=300.0, poll_interval=1.0, retry_base=5.0,
+                 keep_seconds=7 * 86400, context=None):
+        """
+        `handlers`: task name -> callable(payload dict). `context()`, if given,
+        is entered around every task (e.g. the Flask app context).
+        """
+        self.connect = connect
+        self.handlers = handlers
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.keep_seconds = keep_seconds
+        self.context = context
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self.connect()
+            self._db.isolation_level = None  # autocommit: every statement stands alone
+        return self._db
+
+    def reclaim_expired(self):
+        """Requeue tasks whose worker stopped renewing the lease; fail those out of attempts."""
+        now = time.time()
+        failed = self.db.execute(
+            "UPDATE tasks SET status = ?, last_error = ?, finished_at = ?, lease_owner = NULL, lease_until = NULL"
+            " WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+            (FAILED, "lease expired", now, RUNNING, now)).rowcount
+        return failed + self.db.execute(
+            "UPDATE tasks SET status = ?, lease_owner = NULL, lease_until = NULL"
+            " WHERE status = ? AND lease_until < ?", (QUEUED, RUNNING, now)).rowcount
+
+    def claim(self):
+        # fetchall() steps the UPDATE to completion, so the write lock is released right away
+        rows = self.db.execute(CLAIM_SQL, {"owner": self.owner, "now": time.time(), "lease": self.lease}).fetchall()
+        return rows[0] if rows else None
+
+    def _heartbeat(self, task_id, done):
+        db = self.connect()
+        try:
+            while not done.wait(self.lease / 3):
+                db.execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND lease_owner = ?",
+                           (time.time() + self.lease, task_id, self.owner))
+                db.commit()
+        finally:
+            db.close()
+
+    def run_once(self):
+        """Run one due task, if any; returns True when a task was processed."""
+        self.reclaim_expired()
+        task = self.claim()
+        if task is None:
+            return False
+        task_id, name, payload, attempts, max_attempts = task
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(task_id, done), daemon=True)
+        heartbeat.start()
+        try:
+            handler = self.handlers.get(name)
+            if handler is None:
+                raise LookupError(f"no handler for task {name!r}")
+            if self.context is not None:
+                with self.context():
+                    handler(json.loads(payload))
+            else:
+                handler(json.loads(payload))
+        except Exception:
+            error = traceback.format_exc(limit=5)[-2000:]
+            done.set()
+            heartbeat.join()
+            if attempts < max_attempts:
+                self.db.execute(
+                    "UPDATE tasks SET status = ?, run_at = ?, last_error = ?, lease_owner = NULL, lease_until = NULL"
+                    " WHERE id = ? AND lease_owner = ?",
+                    (QUEUED, time.time() + retry_delay(attempts, self.retry_base), error, task_id, self.owner))
+            else:
+                self.db.execute(
+                    "UPDATE tasks SET status = ?, last_error = ?, finished_at = ?, lease_owner = NULL, lease_until = NULL"
+                    " WHERE id = ? AND lease_owner = ?", (FAILED, error, time.time(), task_id, self.owner))
+        else:
+            done.set()
+            heartbeat.join()
+            self.db.execute(
+                "UPDATE tasks SET status = ?, finished_at = ?, last_error = NULL, lease_owner = NULL, lease_until = NULL"
+                " WHERE id = ? AND lease_owner = ?", (DONE, time.time(), task_id, self.owner))
+        self.processed += 1
+        return True
+
+    def prune(self):
+        return self.db.execute("DELETE FROM tasks WHERE status = ? AND finished_at < ?",
+                               (DONE, time.time() - self.keep_seconds)).rowcount
+
+    def run(self):
+        pruned_at = 0.0
+        while not self.stopping.is_set():
+            if time.monotonic() - pruned_at > 3600:
+                self.prune()
+                pruned_at = time.monotonic()
+            if not self.run_once():
+                self.stopping.wait(self.poll_interval)
+
+    def drain(self):
+        """Run every task that is due now (tests, one-off CLI runs); returns how many ran."""
+        n = 0
+        while self.run_once():
+            n += 1
+        return n
+
+
+def run_workers(make_worker, processes=2, on_exit=None):
+    """Fork `processes` workers, restart any that exit, stop them all on SIGTERM/SIGINT."""
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                worker = make_worker()
+                signal.signal(signal.SIGTERM, lambda *_: worker.stopping.set())
+                signal.signal(signal.SIGINT, lambda *_: worker.stopping.set())
+                worker.run()
+            except Exception:
+                code = 1
+                sys.excepthook(*sys.exc_info())
+            finally:
+                if on_exit is not None:
+                    on_exit()
+                os._exit(code)
+        children.add(pid)
+
+    def on_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    print(f" * Running {processes} task workers (pid {os.getpid()})")
+    for _ in range(processes):
+        spawn()
+    while not stopping:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid:
+            children.discard(pid)
+            spawn()
+        else:
+            time.sleep(0.2)
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
@@ -585,7 +585,7 @@ function wireManageGPS() {
     status.className = 'small text-info mt-2';
 
     navigator.geolocation.getCurrentPosition(async pos => {
-      const payload = { lat: pos.coords.latitude, lng: pos.coords.longitude };
+      const payload = { lat: pos.coords.latitude, lng: pos.coords.longitude, manual: true };
       try {
         const res = await fetch(`/api/vendors/${vendorId}/location`, {
           method: 'POST',
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from ad_events import AdEventBuffer, PacingController, IMPRESSION, CLICK
+
+MID_MONTH = datetime(2026, 6, 16, 0, 0, 0).timestamp()  # half of June elapsed
+
+
+@pytest.fixture
+def connect(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "AD_EVENTS_FLUSH_SECONDS", 3600)
+    monkeypatch.setattr(app_module, "_ad_inventory", None)
+    monkeypatch.setattr(app_module, "_ad_events", None)
+    app_module.init_db()
+    connect = app_module.get_database().connect
+    db = connect()
+    db.executescript("""
+        INSERT INTO ad_accounts (id, status, monthly_budget_cents) VALUES (1, 'active', 1000), (2, 'paused', 1000);
+        INSERT INTO ads (id, image_url, link_url, position, ad_account_id, cpm_cents, cpc_cents) VALUES
+            (1, '/a.png', 'https://example.com/a', 'header', 1, 2000, 50),
+            (2, '/b.png', NULL, 'body', 2, 2000, 50),
+            (3, '/c.png', NULL, 'body', NULL, 0, 0);
+    """)
+    db.commit()
+    db.close()
+    yield connect
+    app_module.close_ad_events()
+
+
+def rows(db, sql):
+    return [tuple(r) for r in db.execute(sql).fetchall()]
+
+
+def test_group_commit_and_hourly_rollup(connect):
+    buffer = AdEventBuffer(connect, pacer=PacingController(), flush_interval=3600)
+    ad = {"id": 1, "ad_account_id": 1, "cpm_cents": 2000, "cpc_cents": 50}
+    for _ in range(10):
+        buffer.record(IMPRESSION, ad, placement="header")
+    buffer.record(CLICK, ad, user_id=7)
+    assert buffer.pending == 11
+    assert buffer.pacer.spend(1) == pytest.approx(70)  # counted before it reaches disk
+
+    assert buffer.flush() == 11
+    db = connect()
+    assert db.execute("SELECT COUNT(*) FROM ad_impressions").fetchone()[0] == 10
+    assert rows(db, "SELECT user_id, cost_cents FROM ad_clicks") == [(7, 50.0)]
+    assert rows(db, "SELECT ad_id, impressions, clicks, spend_cents FROM ad_stats_hourly") == [(1, 10, 1, 70.0)]
+    # Flushed spend moves from the buffer to the stored total without double counting
+    assert buffer.pacer.spend(1) == pytest.approx(70)
+    buffer.close()
+
+
+def test_full_buffer_drops(connect):
+    buffer = AdEventBuffer(connect, max_pending=3, flush_interval=3600)
+    results = [buffer.record(IMPRESSION, {"id": 1}) for _ in range(5)]
+    assert results == [True, True, True, False, False]
+    assert buffer.dropped == 2
+    buffer.close()
+
+
+def test_events_dropped_after_a_failed_flush_release_their_spend(connect):
+    buffer = AdEventBuffer(connect, pacer=PacingController(), max_pending=3, flush_interval=3600)
+    ad = {"id": 1, "ad_account_id": 1, "cpm_cents": 2000, "cpc_cents": 50}
+    for _ in range(3):
+        buffer.record(IMPRESSION, ad)
+
+    def fail(db, batch):
+        buffer.record(CLICK, ad)  # more events arrive while the batch is being written
+        buffer.record(CLICK, ad)
+        raise RuntimeError("disk full")
+
+    buffer._write = fail
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert (buffer.pending, buffer.dropped) == (3, 2)  # two impressions no longer fit
+    assert buffer.pacer.spend(1) == pytest.approx(2 + 50 + 50)  # only what is still buffered
+    del buffer._write
+    buffer.close()
+
+
+def test_pacing_throttles_ahead_of_schedule(connect):
+    pacer = PacingController(clock=lambda: MID_MONTH, rng=lambda: 0.5)
+    db = connect()
+    pacer.sync(db)
+    assert pacer.serve_probability(1) == 1.0
+    assert pacer.serve_probability(2) == 0.0  # paused account
+    assert pacer.serve_probability(None) == 1.0
+
+    pacer.add(1, 400)  # 40% of budget at 50% of the month: on pace
+    assert pacer.serve_probability(1) == 1.0
+    pacer.add(1, 400)  # 80% spent, 50% of the month left
+    assert pacer.serve_probability(1) == pytest.approx(0.4)
+    assert not pacer.allow({"ad_account_id": 1})
+    pacer.add(1, 200)
+    assert pacer.serve_probability(1) == 0.0
+
+
+def test_index_records_impressions_and_click_redirects(connect):
+    client = app_module.app.test_client()
+    assert client.get("/").status_code == 200
+    resp = client.get("/ads/1/click")
+    assert resp.status_code == 302 and resp.headers["Location"] == "https://example.com/a"
+    assert client.get("/ads/3/click").status_code == 404  # no link
+
+    app_module.get_ad_events().flush()
+    db = connect()
+    # Ad 2 belongs to a paused account and is never shown
+    assert rows(db, "SELECT ad_id, placement FROM ad_impressions ORDER BY ad_id") == [(1, "header"), (3, "body")]
+    assert rows(db, "SELECT ad_id FROM ad_clicks") == [(1,)]
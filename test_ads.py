@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from ads import AdInventory, TimingWheel
+
+T0 = datetime(2026, 6, 1, 12, 0, 0).timestamp()
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setattr(app_module, "_ad_inventory", None)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.executemany(
+            "INSERT INTO ads (id, image_url, is_active, position, starts_at, ends_at,"
+            " target_lat, target_lng, target_radius_miles) VALUES (?,?,?,?,?,?,?,?,?)", [
+                (1, "/a.png", 1, "header", None, None, None, None, None),
+                (2, "/b.png", 1, "header", "2026-06-01 12:00:30", "2026-06-01 12:05:00", None, None, None),
+                (3, "/c.png", 1, "body", None, "2026-06-01 11:00:00", None, None, None),
+                (4, "/d.png", 0, "header", None, None, None, None, None),
+                (5, "/e.png", 1, "body", None, None, 34.05, -118.24, 10),
+            ])
+        db.commit()
+        yield db
+
+
+def ids(ads):
+    return [ad["id"] for ad in ads]
+
+
+def test_schedule_activates_and_expires_without_queries(db):
+    clock = Clock(T0)
+    inventory = AdInventory(check_interval=60, clock=clock)
+    inventory.refresh(lambda: db)
+    assert ids(inventory.select("header")) == [1]
+    assert ids(inventory.select("body")) == []  # 3 already ended, 5 is targeted
+
+    queries = db.query_count
+    clock.now = T0 + 30
+    assert ids(inventory.select("header")) == [1, 2]
+    clock.now = T0 + 300
+    assert ids(inventory.select("header")) == [1]
+    assert inventory.stats()["scheduled"] == 0
+    assert db.query_count == queries
+
+
+def test_geo_targeting(db):
+    inventory = AdInventory(clock=Clock(T0))
+    inventory.refresh(lambda: db)
+    assert ids(inventory.select("body", 34.10, -118.30)) == [5]
+    assert ids(inventory.select("body", 36.17, -115.14)) == []
+
+
+def test_version_bump_triggers_reload(db):
+    inventory = AdInventory(check_interval=0, clock=Clock(T0))
+    inventory.refresh(lambda: db)
+    assert not inventory.refresh(lambda: db)
+    db.execute("UPDATE ads SET position='body' WHERE id=1")
+    db.commit()
+    assert inventory.refresh(lambda: db)
+    assert ids(inventory.select("header")) == []
+    assert inventory.loads == 2
+
+
+def test_wheel_catches_up_after_idle_gap():
+    wheel = TimingWheel(slots=8)
+    wheel.advance(100)
+    wheel.schedule(103.5, "soon")
+    wheel.schedule(150, "later")  # several revolutions away
+    assert wheel.advance(103) == []
+    assert wheel.advance(104) == ["soon"]
+    assert wheel.advance(149) == []
+    assert wheel.advance(10_000) == ["later"]
+
+
+def test_index_renders_from_inventory(db):
+    client = app_module.app.test_client()
+    assert client.get("/").status_code == 200
+    assert app_module.get_ad_inventory().stats()["ads"] >= 1
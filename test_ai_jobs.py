@@ -0,0 +1,139 @@
+import base64
+import http.server
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import app as app_module
+
+PNG = base64.b64encode(b"\x89PNG fake image").decode()
+
+
+class FakeOpenAI(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls = []
+    release = threading.Event()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).calls.append((self.path, body, self.headers.get("Authorization")))
+        type(self).release.wait(5)
+        if self.path == "/v1/chat/completions":
+            reply = {"choices": [{"message": {"content": f" Tacos that roll to you! ({body['model']}) "}}]}
+        elif self.path == "/v1/images/generations":
+            reply = {"data": [{"b64_json": PNG}]}
+        else:
+            reply = {"error": "unknown"}
+        data = json.dumps(reply).encode()
+        self.send_response(200 if "error" not in reply else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    FakeOpenAI.calls = []
+    FakeOpenAI.release.set()
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setitem(app.config, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setitem(app.config, "HTTP_SERVICES", {
+        "openai": {"base_url": f"http://127.0.0.1:{server.server_port}/v1", "timeout": 5}})
+    monkeypatch.setattr(app_module, "_http_client", None)
+    monkeypatch.setattr(app_module, "_ai_jobs", None)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'V', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, cuisine, is_active) VALUES (7, 1, 'Val Tacos', 'Mexican', 1)")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    yield client
+    server.shutdown()
+    server.server_close()
+
+
+def test_ad_job_runs_in_background_and_is_cached(client):
+    resp = client.post("/ai/generate_ad", json={"tone": "playful"})
+    assert resp.status_code == 202
+    job = client.get(resp.get_json()["status_url"] + "?wait=5").get_json()
+    assert job["status"] == "done"
+    assert job["result"]["text"] == "Tacos that roll to you! (gpt-3.5-turbo)"
+    path, body, auth = FakeOpenAI.calls[0]
+    assert auth == "Bearer sk-test" and "Val Tacos" in body["messages"][1]["content"]
+
+    again = client.post("/ai/generate_ad", json={"tone": "playful"})
+    assert again.status_code == 200 and again.get_json()["cached"]
+    assert client.get(again.get_json()["status_url"]).get_json()["result"] == job["result"]
+    assert len(FakeOpenAI.calls) == 1
+
+
+def test_identical_prompts_share_one_job(client):
+    FakeOpenAI.release.clear()  # hold the fake API until both submits are in
+    first = client.post("/ai/generate_logo", json={"style": "retro"}).get_json()
+    second = client.post("/ai/generate_logo", json={"style": "retro"}).get_json()
+    assert second["deduplicated"] and second["job_id"] == first["job_id"]
+    FakeOpenAI.release.set()
+
+    job = client.get(f"/ai/jobs/{first['job_id']}?wait=5").get_json()
+    assert job["status"] == "done" and len(FakeOpenAI.calls) == 1
+    filename = os.path.basename(job["result"]["logo_url"])
+    with open(os.path.join(app_module.app.config["UPLOAD_FOLDER"], filename), "rb") as fh:
+        assert fh.read() == b"\x89PNG fake image"
+
+
+def test_failures_are_reported(client):
+    app_module.get_ai_jobs().runners["ad"] = lambda params: 1 / 0
+    job_id = client.post("/ai/generate_ad", json={}).get_json()["job_id"]
+    job = client.get(f"/ai/jobs/{job_id}?wait=5").get_json()
+    assert job["status"] == "failed" and "division by zero" in job["error"]
+
+
+def test_unconfigured_key(client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "OPENAI_API_KEY", "")
+    assert client.post("/ai/generate_ad", json={}).status_code == 503
+
+
+def test_long_queued_job_is_not_timed_out_once_started(client):
+    FakeOpenAI.release.clear()
+    job_id = client.post("/ai/generate_ad", json={"tone": "slow"}).get_json()["job_id"]
+    jobs = app_module.get_ai_jobs()
+    db = app_module.get_database().connect()
+    # Submitted long ago, but picked up by a worker just now
+    db.execute("UPDATE ai_jobs SET created_at = created_at - ? WHERE id=?", (jobs.timeout * 2, job_id))
+    db.commit()
+    while not FakeOpenAI.calls:  # the worker has started the job and is waiting on the API
+        time.sleep(0.01)
+    assert jobs.get(job_id)["status"] == "running"
+    assert client.post("/ai/generate_ad", json={"tone": "slow"}).get_json()["deduplicated"]
+    FakeOpenAI.release.set()
+    assert client.get(f"/ai/jobs/{job_id}?wait=5").get_json()["status"] == "done"
+    assert len(FakeOpenAI.calls) == 1
+
+
+def test_job_timeout_outlasts_the_api_deadline(client):
+    deadline = app_module.get_http_client().services["openai"].deadline
+    assert app_module.get_ai_jobs().timeout > deadline
+
+
+def test_wait_must_be_finite(client):
+    job_id = client.post("/ai/generate_ad", json={}).get_json()["job_id"]
+    for bad in ("nan", "inf"):
+        assert client.get(f"/ai/jobs/{job_id}?wait={bad}").status_code == 400
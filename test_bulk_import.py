@@ -0,0 +1,119 @@
+import io
+import json
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "IMPORT_CHUNK_SIZE", 2)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'a@x.com', 'x', 'Ad', 'admin')")
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (2, 'fleet@x.com', 'x', 'Fleet', 'vendor')")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    return client
+
+
+def query(sql):
+    with app_module.app.app_context():
+        return [tuple(r) for r in app_module.get_db().execute(sql).fetchall()]
+
+
+VENDORS_CSV = """external_id,owner_email,name,cuisine,lat,lng
+t-1,fleet@x.com,Truck One,tacos,34.1,-117.2
+t-2,fleet@x.com,Truck Two,,,
+t-3,nobody@x.com,Ghost,,,
+t-4,fleet@x.com,,bbq,,
+t-5,fleet@x.com,Truck Five,bbq,91,0
+"""
+
+
+def test_vendor_csv_import_reports_row_errors(client):
+    resp = client.post("/admin/import/vendors",
+                       data={"file": (io.BytesIO(VENDORS_CSV.encode()), "fleet.csv")})
+    body = resp.get_json()
+    assert (body["rows"], body["written"], body["error_count"]) == (5, 2, 3)
+    assert [e["line"] for e in body["errors"]] == [4, 5, 6]
+    assert "unknown owner user" in body["errors"][0]["error"]
+    assert query("SELECT external_id, owner_user_id, name, cuisine FROM vendors ORDER BY id") == [
+        ("t-1", 2, "Truck One", "tacos"), ("t-2", 2, "Truck Two", None)]
+
+    # Re-importing updates in place; blank columns keep existing values
+    client.post("/admin/import/vendors", data={"file": (io.BytesIO(
+        b"external_id,owner_email,name,cuisine\nt-1,fleet@x.com,Truck Uno,\n"), "fleet.csv")})
+    assert query("SELECT name, cuisine, lat FROM vendors WHERE external_id='t-1'") == [("Truck Uno", "tacos", 34.1)]
+
+
+def test_hours_and_locations_ndjson_import(client):
+    client.post("/admin/import/vendors", data={"file": (io.BytesIO(VENDORS_CSV.encode()), "fleet.csv")})
+    hours = "\n".join(json.dumps(r) for r in [
+        {"vendor_external_id": "t-1", "day_of_week": "mon", "open_time": "9:00", "close_time": "17:00"},
+        {"vendor_external_id": "t-1", "day_of_week": 6, "is_closed": True},
+        {"vendor_external_id": "t-1", "day_of_week": 2, "open_time": "25:00", "close_time": "17:00"},
+        {"vendor_external_id": "t-9", "day_of_week": 3, "is_closed": True},
+    ]) + "\nnot json\n"
+    body = client.post("/admin/import/hours?format=ndjson", data=hours,
+                       content_type="application/x-ndjson").get_json()
+    assert (body["written"], body["error_count"]) == (2, 3)
+    assert query("SELECT day_of_week, open_time, close_time, is_closed FROM vendor_hours ORDER BY day_of_week") == [
+        (0, "09:00", "17:00", 0), (6, None, None, 1)]
+
+    body = client.post("/admin/import/locations", data=b'{"vendor_external_id": "t-2", "lat": 33.5, "lng": -117.1}\n',
+                       content_type="application/x-ndjson").get_json()
+    assert body["ok"] and query("SELECT lat, lng FROM vendors WHERE external_id='t-2'") == [(33.5, -117.1)]
+
+
+def test_dry_run_writes_nothing(client):
+    body = client.post("/admin/import/vendors?dry_run=1",
+                       data={"file": (io.BytesIO(VENDORS_CSV.encode()), "fleet.csv")}).get_json()
+    assert body["written"] == 2
+    assert query("SELECT COUNT(*) FROM vendors") == [(0,)]
+
+
+REJECT_TRIGGER = {
+    "sqlite": """
+        CREATE TRIGGER reject_bad_truck BEFORE INSERT ON vendors WHEN NEW.name = 'Bad Truck'
+        BEGIN SELECT RAISE(ABORT, 'no bad trucks'); END;
+    """,
+    "postgres": """
+        CREATE FUNCTION reject_bad_truck() RETURNS trigger AS $$
+        BEGIN
+          IF NEW.name = 'Bad Truck' THEN RAISE EXCEPTION 'no bad trucks'; END IF;
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER reject_bad_truck BEFORE INSERT ON vendors FOR EACH ROW EXECUTE FUNCTION reject_bad_truck();
+    """,
+}
+
+
+def test_rejected_row_does_not_take_its_chunk_down(client, backend):
+    with app_module.app.app_context():
+        app_module.get_db().executescript(REJECT_TRIGGER[backend])
+    body = client.post("/admin/import/vendors", data={"file": (io.BytesIO(
+        b"external_id,owner_email,name\nt-1,fleet@x.com,Bad Truck\nt-2,fleet@x.com,Good Truck\n"), "fleet.csv")}
+    ).get_json()
+    assert (body["written"], body["error_count"]) == (1, 1)
+    assert "no bad trucks" in body["errors"][0]["error"] and body["errors"][0]["line"] == 2
+    assert query("SELECT name FROM vendors") == [("Good Truck",)]
+
+
+def test_dry_run_with_a_rejected_row_writes_nothing(client, backend):
+    with app_module.app.app_context():
+        app_module.get_db().executescript(REJECT_TRIGGER[backend])
+    body = client.post("/admin/import/vendors?dry_run=1", data={"file": (io.BytesIO(
+        b"external_id,owner_email,name\nt-1,fleet@x.com,Bad Truck\nt-2,fleet@x.com,Good Truck\n"), "fleet.csv")}
+    ).get_json()
+    assert (body["written"], body["error_count"]) == (1, 1)
+    assert query("SELECT COUNT(*) FROM vendors") == [(0,)]
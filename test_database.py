@@ -0,0 +1,175 @@
+import sqlite3
+import threading
+
+import pytest
+
+import app as app_module
+from database import ConnectionPool, Dialect, PoolTimeout, PostgresConnection, SQLITE, Row, translate_placeholders
+
+
+def test_translate_placeholders():
+    assert translate_placeholders("SELECT * FROM t WHERE a=? AND b=?") == "SELECT * FROM t WHERE a=%s AND b=%s"
+    assert translate_placeholders("UPDATE t SET x = :now + :lease") == "UPDATE t SET x = %(now)s + %(lease)s"
+    # literals, comments, casts and % are left alone (apart from escaping %)
+    assert translate_placeholders("SELECT '?:x', \"a?\" -- why?\nFROM t WHERE n LIKE '%' || ? AND v::int = 5 % 2") == (
+        "SELECT '?:x', \"a?\" -- why?\nFROM t WHERE n LIKE '%%' || %s AND v::int = 5 %% 2")
+    assert translate_placeholders("SELECT 'it''s ?'") == "SELECT 'it''s ?'"
+
+
+def test_row_reads_by_index_and_name():
+    row = Row((1, "Tacos"), {"id": 0, "name": 1})
+    assert row[0] == row["id"] == 1 and row["name"] == "Tacos"
+    assert dict(zip(row.keys(), row)) == {"id": 1, "name": "Tacos"}
+    vendor_id, name = row
+    assert name == "Tacos"
+
+
+def test_pool_is_bounded_and_hands_back_released_connections():
+    opened = []
+    pool = ConnectionPool(lambda: opened.append(object()) or opened[-1], size=2, timeout=0.1)
+    a, b = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+    threading.Timer(0.05, pool.release, (a,)).start()
+    pool.timeout = 1
+    assert pool.acquire() is a  # the waiter gets the released connection
+    pool.release(b, broken=True)
+    assert pool.stats()["open"] == 1 and len(opened) == 2
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+        self.description = [type("Col", (), {"name": "id"})()]
+
+    def fetchall(self):
+        return [(42,)]
+
+
+class FakeRaw:
+    closed = broken = False
+    autocommit = False
+
+    def __init__(self):
+        self.log, self.rollbacks = [], 0
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_postgres_connection_translates_and_returns_to_pool():
+    raw = FakeRaw()
+    pool = ConnectionPool(lambda: raw, size=1)
+    db = PostgresConnection(pool, pool.acquire())
+    rows = db.execute("SELECT id FROM t WHERE a=? AND b LIKE 'x%'", (1,)).fetchall()
+    db.execute("SELECT 1 WHERE 'x%' = 'x%'")
+    assert raw.log == [("SELECT id FROM t WHERE a=%s AND b LIKE 'x%%'", (1,)),
+                       ("SELECT 1 WHERE 'x%' = 'x%'", None)]
+    assert rows[0]["id"] == 42 and db.query_count == 2
+    db.close()
+    assert raw.rollbacks == 1 and pool.stats()["in_use"] == 0
+
+
+@pytest.mark.parametrize("dialect", [SQLITE, Dialect("sqlite", returning=False, upsert=False)],
+                         ids=["fast-path", "fallback"])
+def test_dialect_insert_and_upsert(dialect):
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute("CREATE TABLE kv (id INTEGER PRIMARY KEY, k TEXT UNIQUE, v TEXT)")
+    row = dialect.insert(db, "kv", {"k": "a", "v": "1"}, returning="*")
+    assert (row["id"], row["k"], row["v"]) == (1, "a", "1")
+    db.execute(dialect.upsert("kv", ["k", "v"], ["k"]), ("a", "2"))
+    assert db.execute("SELECT v FROM kv WHERE k='a'").fetchone()[0] == "2"
+
+
+def test_signup_logs_in_the_returned_user(tmp_path, monkeypatch):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+    app_module.init_db()
+    client = app.test_client()
+    resp = client.post("/signup/vendor", data={"name": "Val Tacos", "first_name": "Val", "last_name": "V",
+                                               "email": "val@example.com", "password": "pw"})
+    assert resp.status_code == 302
+    with app.app_context():
+        vendor = app_module.get_db().execute(
+            "SELECT v.name FROM vendors v JOIN users u ON u.id = v.owner_user_id WHERE u.email=?",
+            ("val@example.com",)).fetchone()
+    assert vendor["name"] == "Val Tacos"
+    with client.session_transaction() as session:
+        assert session["_user_id"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "RATE_LIMIT_ENABLED", False)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'V', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Val Tacos', 1)")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    return client
+
+
+@pytest.mark.sqlite_only  # mode=ro connections and WAL
+def test_get_requests_read_through_read_only_connections(client):
+    app = app_module.app
+    with app.test_request_context("/api/vendors"):
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            app_module.get_read_db().execute("DELETE FROM vendors")
+    with app.test_request_context("/api/vendors/7/like", method="POST"):
+        assert app_module.get_read_db() is app_module.get_db()
+
+    # A write transaction holding the lock doesn't hold up GETs
+    writer = sqlite3.connect(app.config["DATABASE"], timeout=0)
+    writer.execute("BEGIN EXCLUSIVE")  # blocks readers unless the database is in WAL mode
+    writer.execute("UPDATE vendors SET name='Val Burritos' WHERE id=7")
+    try:
+        assert client.get("/api/vendors").get_json()[0]["name"] == "Val Tacos"
+        assert client.get("/vendor/7").status_code == 200
+    finally:
+        writer.rollback()
+        writer.close()
+    assert client.post("/api/vendors/7/like").get_json()["liked"]
+    assert client.get("/vendor/7").status_code == 200
+
+
+def test_postgres_without_replica_reads_on_the_request_connection(client, backend):
+    if backend != "postgres":
+        pytest.skip("PostgreSQL only")
+    with app_module.app.test_request_context("/api/vendors"):
+        assert app_module.get_read_db() is app_module.get_db()  # one pooled connection per GET
+    assert client.get("/vendor/7").status_code == 200
+
+
+def test_like_toggle_keeps_counts(client):
+    assert client.post("/api/vendors/7/like").get_json()["liked"]
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        assert db.execute("SELECT like_count FROM vendor_counts WHERE vendor_id=?", (7,)).fetchone()["like_count"] == 1
+    assert client.get("/status").get_json()["ready"]
+
+
+def test_task_queue_round_trip(client):
+    with app_module.app.app_context():
+        app_module.enqueue_task("repair_counts")
+        app_module.get_db().commit()
+    assert app_module.make_task_worker().drain() == 1
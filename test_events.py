@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+import recurrence
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setattr(app_module, "_occurrence_cache", None)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.executemany(
+            "INSERT INTO events (id, title, start_time, end_time, lat, lng, recurrence) VALUES (?,?,?,?,?,?,?)", [
+                (1, "Past fair", "2026-01-10 10:00:00", "2026-01-10 18:00:00", 34.05, -118.24, None),
+                (2, "Food fest", "2026-03-14T11:00:00", "2026-03-15T20:00:00", 34.06, -118.25, None),
+                (3, "Vegas night", "2026-03-20 19:00:00", None, 36.17, -115.14, None),
+                (4, "Saturday market", "2026-01-03 08:00:00", "2026-01-03 13:00:00", 34.07, -118.26,
+                 "FREQ=WEEKLY;BYDAY=SA;UNTIL=2026-04-30"),
+            ])
+        db.commit()
+    app_module.init_db()  # migration normalizes the 'T'-separated timestamp
+    return app.test_client()
+
+
+def titles(resp):
+    return [(e["title"], e["start_time"]) for e in resp.get_json()]
+
+
+def test_window_excludes_past_and_expands_recurring(client):
+    resp = client.get("/api/events?from=2026-03-14&to=2026-03-22")
+    assert titles(resp) == [
+        ("Saturday market", "2026-03-14 08:00:00"),
+        ("Food fest", "2026-03-14 11:00:00"),
+        ("Vegas night", "2026-03-20 19:00:00"),
+        ("Saturday market", "2026-03-21 08:00:00"),
+    ]
+    # Multi-day event still running at the start of the window
+    assert ("Food fest", "2026-03-14 11:00:00") in titles(client.get("/api/events?from=2026-03-15T12:00&to=2026-03-16"))
+
+
+def test_near_filters_by_radius(client):
+    resp = client.get("/api/events?from=2026-03-14&to=2026-03-22&near=34.05,-118.24&radius=15")
+    assert {e["title"] for e in resp.get_json()} == {"Saturday market", "Food fest"}
+    assert all(e["distance_miles"] < 15 for e in resp.get_json())
+
+
+def test_recurrence_stops_at_until_and_is_cached(client, monkeypatch):
+    assert titles(client.get("/api/events?from=2026-04-20&to=2026-05-20")) == [("Saturday market", "2026-04-25 08:00:00")]
+
+    calls = []
+    real = recurrence.expand
+    monkeypatch.setattr(recurrence, "expand", lambda *a: calls.append(a) or real(*a))
+    client.get("/api/events?from=2026-04-21&to=2026-05-10")  # inside the cached horizon
+    assert calls == []
+
+
+def test_bad_window_is_rejected(client):
+    assert client.get("/api/events?from=soon").status_code == 400
+    assert client.get("/api/events?from=2026-03-01&to=2026-02-01").status_code == 400
+
+
+def test_weekly_rule_expansion():
+    rule = recurrence.parse_rule("FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;COUNT=3")
+    occ = recurrence.expand(datetime(2026, 1, 6, 9), None, rule, datetime(2026, 1, 1), datetime(2026, 3, 1))
+    assert [s.strftime("%m-%d") for s, _ in occ] == ["01-06", "01-08", "01-20"]
@@ -0,0 +1,96 @@
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    app_module.init_db()
+
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute(
+            "INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'Val Vendor', 'vendor')"
+        )
+        db.execute(
+            "INSERT INTO vendors (id, owner_user_id, name, first_name, is_active) VALUES (7, 1, 'Val Tacos', 'Val', 1)"
+        )
+        db.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    return client
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    """Collect every SQL statement issued through get_db() and get_read_db()."""
+    seen = []
+    original = app_module._open_db
+
+    def traced_open_db(readonly=False):
+        db = original(readonly)
+        db.set_trace_callback(seen.append)
+        return db
+
+    monkeypatch.setattr(app_module, "_open_db", traced_open_db)
+    return seen
+
+
+def test_vendor_manage_page_loads_identity_once(client, statements):
+    resp = client.get("/manage")
+    assert resp.status_code == 200
+    assert b"Val Tacos" in resp.data
+
+    # one users row for the login loader, one vendors row shared by the
+    # route and the template context processor
+    assert len(statements) == 2
+    assert "FROM users" in statements[0]
+    assert "FROM vendors" in statements[1]
+
+
+def test_identity_ttl_cache_skips_queries_until_invalidated(client, statements, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "IDENTITY_CACHE_TTL", 60)
+    monkeypatch.setattr(app_module, "_identity_cache", app_module.OrderedDict())
+
+    client.get("/manage")
+    statements.clear()
+    client.get("/manage")
+    assert statements == []
+
+    resp = client.post("/api/vendors/7/update", json={"name": "Val Burritos"})
+    assert resp.get_json()["ok"] is True
+    statements.clear()
+    resp = client.get("/manage")
+    assert b"Val Burritos" in resp.data
+    assert any("FROM vendors" in sql for sql in statements)
+
+
+def test_row_read_before_an_eviction_is_not_cached(client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "IDENTITY_CACHE_TTL", 60)
+    monkeypatch.setattr(app_module, "_identity_cache", app_module.OrderedDict())
+    original = app_module.get_read_db
+
+    class RenameDuringRead:
+        """The read sees the old vendor row, then another worker renames it and the bus evicts."""
+        def __init__(self, db):
+            self.db = db
+
+        def execute(self, *args):
+            row = self.db.execute(*args).fetchone()
+            app_module._evict_vendors({7})
+            return type("Row", (), {"fetchone": lambda self: row})()
+
+    with app_module.app.test_request_context():
+        monkeypatch.setattr(app_module, "get_read_db", lambda: RenameDuringRead(original()))
+        assert app_module.get_vendor_for_owner(1)["name"] == "Val Tacos"
+        assert ("vendor", 1) not in app_module._identity_cache
+    with app_module.app.test_request_context():
+        monkeypatch.setattr(app_module, "get_read_db", original)
+        app_module.get_vendor_for_owner(1)
+        assert ("vendor", 1) in app_module._identity_cache
@@ -0,0 +1,133 @@
+import sqlite3
+import time
+
+import pytest
+
+import app as app_module
+from invalidation import SCHEMA, InvalidationBus, sqlite_triggers
+
+
+@pytest.fixture
+def connect(tmp_path):
+    path = str(tmp_path / "bus.db")
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.execute("CREATE TABLE likes (user_id INTEGER, item_id INTEGER)")
+    db.executescript(sqlite_triggers("likes", "likes", "user_id"))
+    db.close()
+    return lambda: sqlite3.connect(path, check_same_thread=False)
+
+
+def test_bus_dispatches_committed_keys_once(connect):
+    seen = []
+    bus = InvalidationBus(connect)
+    bus.subscribe("likes", seen.append)
+    assert bus.poll() == 0
+
+    writer = connect()
+    writer.execute("INSERT INTO likes VALUES (1, 10)")
+    writer.rollback()
+    writer.executemany("INSERT INTO likes VALUES (?, ?)", [(1, 10), (1, 11), (2, 10)])
+    writer.execute("UPDATE likes SET item_id = 12 WHERE user_id = 2")
+    writer.commit()
+
+    assert bus.poll() == 4
+    assert seen == [{1, 2}]
+    assert bus.poll() == 0  # data_version unchanged: the outbox isn't even read
+
+
+def test_bus_without_data_version_rereads_lag_window_without_repeats(connect):
+    seen = []
+    bus = InvalidationBus(connect, data_version=False)
+    bus.subscribe("likes", seen.append)
+    bus.poll()
+    writer = connect()
+    writer.execute("INSERT INTO likes VALUES (3, 10)")
+    writer.commit()
+    assert bus.poll() == 1 and bus.poll() == 0
+    assert seen == [{3}]
+
+
+def test_bus_flushes_everything_after_missing_the_retention_window(connect):
+    seen = []
+    bus = InvalidationBus(connect, retention=60)
+    bus.subscribe("likes", seen.append)
+    bus.poll()
+    bus._polled_at = time.time() - 120
+    bus.poll()
+    assert seen == [None]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "IDENTITY_CACHE_TTL", 60)
+    monkeypatch.setitem(app.config, "INVALIDATION_POLL_SECONDS", 0)  # the test polls by hand
+    monkeypatch.setattr(app_module, "_identity_cache", app_module.OrderedDict())
+    monkeypatch.setattr(app_module, "_viewer_state_cache", app_module.OrderedDict())
+    monkeypatch.setattr(app_module, "_vendor_hours_cache", {})
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'V', 'vendor')")
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (2, 'c@example.com', 'x', 'C', 'customer')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Val Tacos', 1)")
+        db.execute("INSERT INTO vendor_hours (vendor_id, day_of_week, open_time, close_time, is_closed) VALUES (7, 0, '09:00', '17:00', 0)")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    return client
+
+
+def test_writes_from_another_process_evict_only_their_keys(client):
+    bus = app_module.get_invalidation_bus()
+    bus.poll()
+    assert b"Val Tacos" in client.get("/manage").data
+    assert client.get("/api/vendors/7/hours").get_json()["hours"] == {"Monday": "9:00 AM to 5:00 PM"}
+    with app_module.app.test_request_context():
+        for table in ("vendor_likes", "reel_likes"):
+            for user_id in (1, 2):
+                app_module.get_viewer_ids(table, user_id)
+
+    # Another worker renames the vendor, changes its hours and likes it as user 2
+    other = app_module.get_database().connect()
+    other.execute("UPDATE vendors SET name='Val Burritos' WHERE id=7")
+    other.execute("UPDATE vendor_hours SET close_time='22:00' WHERE vendor_id=7")
+    other.execute("INSERT INTO vendor_likes (user_id, vendor_id) VALUES (2, 7)")
+    other.commit()
+    other.close()
+
+    assert b"Val Tacos" in client.get("/manage").data  # still cached...
+    assert bus.poll() == 3
+    assert b"Val Burritos" in client.get("/manage").data  # ...until the bus evicts it
+    assert client.get("/api/vendors/7/hours").get_json()["hours"] == {"Monday": "9:00 AM to 10:00 PM"}
+    assert set(app_module._viewer_state_cache) == {("vendor_likes", 1), ("reel_likes", 1), ("reel_likes", 2)}
+    assert ("user", 1) in app_module._identity_cache
+
+
+def test_hours_read_before_an_invalidation_are_not_cached(client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "VENDOR_HOURS_CACHE_TTL", 300)
+    monkeypatch.setattr(app_module, "_vendor_hours_generation", {})
+    original = app_module.get_read_db
+
+    class SaveDuringRead:
+        """The read sees the old hours, then a save commits and invalidates before the fill is stored."""
+        def __init__(self, db):
+            self.db = db
+
+        def execute(self, *args):
+            rows = self.db.execute(*args).fetchall()
+            app_module.invalidate_vendor_hours([7])
+            return type("Rows", (), {"fetchall": lambda self: rows})()
+
+    with app_module.app.test_request_context():
+        monkeypatch.setattr(app_module, "get_read_db", lambda: SaveDuringRead(original()))
+        assert app_module.load_vendor_hours(7) == {0: ("09:00", "17:00", 0)}
+        assert 7 not in app_module._vendor_hours_cache
+        monkeypatch.setattr(app_module, "get_read_db", original)
+        app_module.load_vendor_hours(7)
+        assert 7 in app_module._vendor_hours_cache
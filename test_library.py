@@ -0,0 +1,60 @@
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "RATE_LIMIT_ENABLED", False)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'a@x.com', 'x', 'Ann', 'customer')")
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (2, 'b@x.com', 'x', 'Bob', 'customer')")
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (3, 'v@x.com', 'x', 'Val', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, cuisine, is_active) VALUES (7, 3, 'Val Tacos', 'Mexican', 1)")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (8, 3, 'Val Burritos', 1)")
+        db.commit()
+    return app.test_client()
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def test_library_is_private(client):
+    login(client, 1)
+    assert client.get("/api/users/2/library").status_code == 403
+    assert client.get("/api/users/1/library").get_json() == {"faved": [], "saved": []}
+
+
+def test_library_lists_faved_and_saved_vendors_with_counts(client):
+    login(client, 2)
+    assert client.post("/api/vendors/7/like").get_json()["liked"]
+
+    login(client, 1)
+    assert client.post("/api/vendors/7/like").get_json()["liked"]
+    assert client.post("/api/vendors/8/like").get_json()["liked"]
+    assert not client.post("/api/vendors/8/like").get_json()["liked"]  # unlike
+    assert client.post("/api/vendors/7/save").get_json()["saved"]
+
+    library = client.get("/api/users/1/library").get_json()
+    assert set(library) == {"faved", "saved"}
+    (faved,) = library["faved"]
+    (saved,) = library["saved"]
+    assert (faved["id"], faved["name"], faved["cuisine"]) == (7, "Val Tacos", "Mexican")
+    assert faved["faved_at"] and saved["saved_at"] and saved["id"] == 7
+    for vendor in (faved, saved):
+        assert (vendor["like_count"], vendor["save_count"]) == (2, 1)
+
+    login(client, 2)
+    assert client.get("/api/users/2/library").get_json()["faved"][0]["like_count"] == 2
+    with app_module.app.app_context():
+        counts = app_module.get_db().execute(
+            "SELECT vendor_id, like_count, save_count FROM vendor_counts ORDER BY vendor_id").fetchall()
+    assert [tuple(r) for r in counts if r[1] or r[2]] == [(7, 2, 1)]
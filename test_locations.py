@@ -0,0 +1,101 @@
+import pytest
+
+import app as app_module
+import locations
+from locations import PingFilter, LocationHistory
+
+T0 = 1_780_000_020  # on a minute boundary
+
+
+def test_delta_encoding_round_trip():
+    points = [(T0, 34.052235, -118.243683), (T0 + 30, 34.052301, -118.243512), (T0 + 95, 34.051, -118.25)]
+    row = locations.encode(points)
+    assert len(row[3]) <= 12  # three small varints per later point
+    assert locations.decode(*row) == points
+
+
+def test_filter_thresholds():
+    pings = PingFilter(min_seconds=5, min_meters=15, move_meters=75, heartbeat=300)
+    assert pings.classify(1, 34.0, -118.0, now=T0) == PingFilter.MOVED  # nothing stored yet
+    assert pings.classify(1, 34.0003, -118.0, now=T0 + 2) == PingFilter.DROPPED  # too soon
+    assert pings.classify(1, 34.00005, -118.0, now=T0 + 30) == PingFilter.DROPPED  # ~5 m
+    assert pings.classify(1, 34.0003, -118.0, now=T0 + 60) == PingFilter.HISTORY  # ~33 m
+    assert pings.classify(1, 34.001, -118.0, now=T0 + 90) == PingFilter.MOVED  # ~111 m from the stored row
+    assert pings.classify(1, 34.001, -118.0, now=T0 + 400) == PingFilter.MOVED  # heartbeat
+
+
+def test_flush_and_compact(tmp_path, monkeypatch, backend):
+    monkeypatch.setitem(app_module.app.config, "DATABASE", str(tmp_path / "test.db"))
+    app_module.init_db()
+    db = app_module.get_database().connect()
+    db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'V', 'vendor')")
+    db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Tacos', 1)")
+    db.commit()
+    history = LocationHistory(app_module.get_database().connect, flush_interval=3600)
+    for i in range(120):
+        history.add(7, 34.0 + i * 1e-4, -118.0, ts=T0 + i * 10)
+        if i % 30 == 29:
+            history.flush()
+    assert tuple(db.execute("SELECT COUNT(*), SUM(points) FROM vendor_location_history").fetchone()) == (4, 120)
+
+    assert locations.compact(db, T0 + 10_000, resolution=60) == (4, 1)
+    trail = locations.read_trail(db, 7, T0, T0 + 10_000)
+    assert len(trail) == 21  # one point per minute plus the last one
+    assert trail[0] == (T0, 34.0, -118.0) and trail[-1][0] == T0 + 1190
+    history.close()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setitem(app.config, "LOCATION_MIN_SECONDS", 0)
+    monkeypatch.setattr(app_module, "_ping_filter", None)
+    monkeypatch.setattr(app_module, "_location_history", None)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'V', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Tacos', 1)")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    yield client
+    app_module.close_location_history()
+
+
+def test_only_material_moves_update_vendor(client, tmp_path):
+    post = lambda lat: client.post("/api/vendor/location", json={"lat": lat, "lng": -118.0}).get_json()
+    assert post(34.0)["updated"]
+    assert not post(34.0)["updated"]       # didn't move: dropped
+    assert not post(34.0003)["updated"]    # ~33 m: trail only
+    assert post(34.002)["updated"]
+
+    db = app_module.get_database().connect()
+    assert db.execute("SELECT lat FROM vendors WHERE id=7").fetchone()["lat"] == 34.002
+    app_module.get_location_history().flush()
+    trail = client.get("/api/vendors/7/trail?from=1").get_json()["points"]
+    assert [p[1] for p in trail] == [34.0, 34.0003, 34.002]
+
+
+def test_large_moves_and_manual_updates_pass_the_filter():
+    pings = PingFilter(min_seconds=5, min_meters=15, move_meters=75, heartbeat=300)
+    assert pings.classify(1, 34.0, -118.0, now=T0) == PingFilter.MOVED
+    assert pings.classify(1, 34.002, -118.0, now=T0 + 1) == PingFilter.MOVED  # ~222 m: a correction, not jitter
+    assert pings.classify(1, 34.002, -118.0, now=T0 + 2) == PingFilter.DROPPED
+    assert pings.classify(1, 34.002, -118.0, now=T0 + 3, manual=True) == PingFilter.MOVED
+
+
+def test_manual_update_inside_the_window_updates_vendor(client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "LOCATION_MIN_SECONDS", 60)
+    monkeypatch.setattr(app_module, "_ping_filter", None)
+    post = lambda lat, **extra: client.post("/api/vendor/location", json={"lat": lat, "lng": -118.0, **extra}).get_json()
+    assert post(34.0)["updated"]
+    assert not post(34.0003)["updated"]
+    assert post(34.0003, manual=True)["updated"]
+    db = app_module.get_database().connect()
+    assert db.execute("SELECT lat FROM vendors WHERE id=7").fetchone()["lat"] == 34.0003
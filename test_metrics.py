@@ -0,0 +1,116 @@
+import json
+import sys
+
+import pytest
+
+import app as app_module
+from metrics import process_rss_bytes
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setattr(app_module, "metrics_registry", app_module.Registry())
+    app_module.init_db()
+    return app.test_client()
+
+
+def test_metrics_report_latency_sql_and_size_per_endpoint(client):
+    assert client.get("/api/reels").status_code == 200
+    client.get("/no-such-page")
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'deliciousroute_requests_total{endpoint="api_reels",method="GET",status="200"} 1' in body
+    assert 'deliciousroute_requests_total{endpoint="unmatched",method="GET",status="404"} 1' in body
+    assert 'deliciousroute_request_duration_seconds_count{endpoint="api_reels",method="GET"} 1' in body
+    # one SELECT for the reel list
+    assert 'deliciousroute_sql_queries_per_request_bucket{endpoint="api_reels",le="1"} 1' in body
+    assert 'deliciousroute_response_size_bytes_count{endpoint="api_reels"} 1' in body
+
+
+@pytest.mark.sqlite_only  # swaps in an empty database file
+def test_status_reports_readiness(client, tmp_path, monkeypatch):
+    resp = client.get("/status")
+    assert resp.status_code == 200
+    assert resp.get_json()["ready"] is True
+
+    monkeypatch.setitem(app_module.app.config, "DATABASE", str(tmp_path / "empty.db"))
+    resp = client.get("/status")
+    assert resp.status_code == 503
+    assert "missing tables" in resp.get_json()["checks"]["database"]
+
+
+@pytest.mark.sqlite_only  # EXPLAIN QUERY PLAN
+def test_slow_query_log_captures_plan_and_route(client, tmp_path, monkeypatch):
+    log_file = tmp_path / "slow.jsonl"
+    monkeypatch.setitem(app_module.app.config, "SLOW_QUERY_MS", 1e-6)  # everything is slow
+    monkeypatch.setitem(app_module.app.config, "SLOW_QUERY_LOG_FILE", str(log_file))
+    monkeypatch.setattr(app_module, "_slow_query_log", None)
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'a@x.com', 'x', 'Ad', 'admin')")
+        db.commit()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+
+    client.get("/api/vendors/cards")
+    client.get("/api/vendors/cards")
+
+    entries = client.get("/admin/slow-queries").get_json()["entries"]
+    cards = [e for e in entries if e["route"] == "api_vendor_cards" and "FROM vendors" in e["sql"]]
+    assert cards and cards[0]["plan"]
+    assert "?" in cards[0]["sql"] and "'" not in cards[0]["sql"]
+
+    queries = client.get("/admin/slow-queries?aggregate=1").get_json()["queries"]
+    assert any(q["count"] >= 2 and "api_vendor_cards" in q["routes"] for q in queries)
+    # Closed connections flushed their entries to the shared file for the CLI
+    assert any(e["route"] == "api_vendor_cards" for e in app_module.read_slow_query_file(str(log_file)))
+
+
+def test_slow_query_admin_endpoint_requires_admin(client):
+    assert client.get("/admin/slow-queries").status_code in (302, 401)
+
+
+def test_access_and_event_lines_are_written_off_the_request_path(client, tmp_path, monkeypatch):
+    log_dir = tmp_path / "logs"
+    monkeypatch.setitem(app_module.app.config, "LOG_DIR", str(log_dir))
+    monkeypatch.setattr(app_module, "_event_log", None)
+    monkeypatch.setattr(app_module, "_ping_filter", None)
+    with app_module.app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@x.com', 'x', 'Val', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Val Tacos', 1)")
+        db.commit()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+
+    client.get("/api/reels")
+    client.post("/api/vendor/location", json={"lat": 34.1, "lng": -117.2})
+    log = app_module.get_event_log()
+    log.flush()
+
+    access = [json.loads(line) for line in (log_dir / "access.jsonl").read_text().splitlines()]
+    reels = next(a for a in access if a["endpoint"] == "api_reels")
+    assert reels["status"] == 200 and reels["db_queries"] >= 1 and reels["bytes"] > 0
+    assert reels["role"] == "vendor" and reels["ms"] >= reels["db_ms"]
+
+    events = [json.loads(line) for line in (log_dir / "events.jsonl").read_text().splitlines()]
+    assert events[0]["event"] == "location_update" and events[0]["user_id"] == 1
+    log.close()
+
+
+def test_metrics_skip_rss_where_it_is_unavailable(client, monkeypatch):
+    def no_proc(*args, **kwargs):
+        raise OSError("no /proc")
+
+    with monkeypatch.context() as m:
+        m.setattr("builtins.open", no_proc)
+        m.setitem(sys.modules, "resource", None)  # as on Windows
+        assert process_rss_bytes() is None
+    monkeypatch.setattr(app_module, "process_rss_bytes", lambda: None)
+    body = client.get("/metrics").get_data(as_text=True)
+    assert "process_uptime_seconds" in body and "process_resident_memory_bytes" not in body
@@ -0,0 +1,119 @@
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from outbound import CircuitOpen, OutboundClient, UpstreamError
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    calls = []
+    fail_next = 0
+
+    def do_GET(self):
+        cls = type(self)
+        cls.calls.append((self.path, self.client_address[1]))
+        if self.path.startswith("/slow"):
+            time.sleep(1)
+        if self.path.startswith("/down") or cls.fail_next > 0:
+            cls.fail_next -= 1
+            return self._send(503, {"error": "down"})
+        if self.path.startswith("/reverse"):
+            return self._send(200, {"address": {"town": "Pomona"}})
+        self._send(200, {"ok": True})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    StubHandler.calls, StubHandler.fail_next = [], 0
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(url, **opts):
+    options = {"base_url": url, "timeout": 0.2, "retries": 2, "backoff": 0.01, "failure_threshold": 3,
+               "reset_timeout": 0.2, **opts}
+    return OutboundClient({"stub": options})
+
+
+def test_keep_alive_reuses_connection(stub):
+    client = make_client(stub)
+    for _ in range(3):
+        assert client.get("stub", "/ok").json() == {"ok": True}
+    assert len({port for _, port in StubHandler.calls}) == 1
+
+
+def test_retries_then_succeeds(stub):
+    StubHandler.fail_next = 2
+    client = make_client(stub)
+    assert client.get("stub", "/ok").status_code == 200
+    assert len(StubHandler.calls) == 3
+    assert client.stats()["stub"]["state"] == "closed"
+
+
+def test_deadline_bounds_slow_service(stub):
+    client = make_client(stub, retries=1, deadline=0.5)
+    started = time.monotonic()
+    with pytest.raises(UpstreamError):
+        client.get("stub", "/slow")
+    assert time.monotonic() - started < 0.9
+
+
+def test_circuit_opens_fails_fast_and_recovers(stub):
+    client = make_client(stub, retries=0)
+    for _ in range(3):
+        with pytest.raises(UpstreamError):
+            client.get("stub", "/down")
+    with pytest.raises(CircuitOpen):
+        client.get("stub", "/ok")
+    assert len(StubHandler.calls) == 3  # refused without a request
+
+    time.sleep(0.25)  # half-open: one trial call closes it again
+    assert client.get("stub", "/ok").status_code == 200
+    assert client.stats()["stub"]["state"] == "closed"
+
+
+def test_location_update_uses_geocoder_stub(stub, tmp_path, monkeypatch):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "HTTP_SERVICES", {"geocoder": {"base_url": stub, "timeout": 0.5}})
+    monkeypatch.setattr(app_module, "_http_client", None)
+    monkeypatch.setattr(app_module, "_ping_filter", None)
+    monkeypatch.setattr(app_module, "_location_history", None)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'V', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Tacos', 1)")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+
+    assert client.post("/api/vendors/7/location", json={"lat": 34.05, "lng": -117.75}).get_json()["updated"]
+    assert StubHandler.calls == []  # geocoding runs in the task worker, not the request
+    assert app_module.make_task_worker().drain() == 1
+    assert StubHandler.calls[0][0].startswith("/reverse?lat=34.05")
+    with app.app_context():
+        assert app_module.get_db().execute("SELECT current_city FROM vendors WHERE id=7").fetchone()[0] == "Pomona"
+    app_module.close_location_history()
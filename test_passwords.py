@@ -0,0 +1,26 @@
+import time
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher
+
+
+def test_timeout_is_busy_and_keeps_the_slot_until_the_job_ends():
+    hasher = PasswordHasher(workers=1, max_pending=1, timeout=0.2)
+    try:
+        hasher._run(time.sleep, 0)  # start the pool outside the timed part
+        with pytest.raises(HasherBusy):
+            hasher._run(time.sleep, 1.0)
+        with pytest.raises(HasherBusy):
+            hasher._run(time.sleep, 0)  # the slow hash is still running in the pool
+        time.sleep(1.0)
+        assert hasher._run(time.sleep, 0) is None
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.parametrize("method", ["pbkdf2:sha256", "pbkdf2:sha256:1000", "scrypt"])
+def test_needs_rehash_fills_in_werkzeug_defaults(method):
+    hasher = PasswordHasher(method=method, workers=0)
+    assert not hasher.needs_rehash(hasher.hash("pw"))
+    assert hasher.needs_rehash(PasswordHasher(method="pbkdf2:sha256:2000", workers=0).hash("pw"))
@@ -0,0 +1,74 @@
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setitem(app.config, "PROFILE_MAX_FILES", 2)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'a@x.com', 'x', 'Ad', 'admin')")
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (2, 'c@x.com', 'x', 'Cu', 'customer')")
+        db.commit()
+    return app.test_client()
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+@pytest.mark.parametrize("mode", ["sample", "trace"])
+def test_admin_profile_is_saved_as_folded_stacks(client, mode):
+    login(client, 1)
+    resp = client.get(f"/api/vendors/cards?_profile={mode}")
+    assert resp.status_code == 200
+    name = resp.headers["X-Profile-Id"]
+    assert name.endswith(f"api_vendor_cards-{mode}.folded")
+
+    if mode == "trace":
+        body = client.get(f"/admin/profiles/{name}").get_data(as_text=True)
+        assert "api_vendor_cards (app.py:" in body
+        stack, weight = body.splitlines()[0].rsplit(" ", 1)
+        assert int(weight) > 0
+
+
+def test_profiles_are_admin_only_and_capped(client):
+    login(client, 2)
+    resp = client.get("/api/reels", headers={"X-Profile": "sample"})
+    assert "X-Profile-Id" not in resp.headers
+
+    login(client, 1)
+    for _ in range(4):
+        client.get("/api/reels", headers={"X-Profile": "trace"})
+    assert len(client.get("/admin/profiles").get_json()["profiles"]) == 2
+
+
+def test_memory_snapshots_and_diff(client):
+    login(client, 1)
+    try:
+        assert client.post("/admin/memory/snapshots", json={"name": "early"}).status_code == 409
+        for bad in ("many", None, [3], 1e999):
+            assert client.post("/admin/memory/start", json={"frames": bad}).status_code == 400
+        assert client.post("/admin/memory/start", json={"frames": 3}).get_json()["tracing"] is True
+        client.post("/admin/memory/snapshots", json={"name": "before"})
+        hoard = [bytearray(4096) for _ in range(200)]  # noqa: F841 - held across the snapshot
+        resp = client.post("/admin/memory/snapshots", json={"name": "after"})
+        assert resp.get_json()["top"]
+
+        diff = client.get("/admin/memory/diff?from=before&to=after").get_json()
+        assert diff["rss_bytes"] > 0
+        assert any("test_profiling.py" in d["site"] and d["size_diff_bytes"] >= 200 * 4096
+                   for d in diff["diff"])
+        assert client.get("/admin/memory/diff?from=before&to=nope").status_code == 404
+        assert "deliciousroute_tracemalloc_traced_bytes" in client.get("/metrics").get_data(as_text=True)
+    finally:
+        client.post("/admin/memory/stop")
+    assert client.get("/admin/memory").get_json()["snapshots"] == []
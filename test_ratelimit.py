@@ -0,0 +1,76 @@
+import pytest
+
+import app as app_module
+from ratelimit import MemoryStore, SQLiteStore, parse_limit
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_limit():
+    limit = parse_limit("30/minute burst 10")
+    assert (limit.rate, limit.burst) == (0.5, 10)
+    assert parse_limit("5/10s").rate == 0.5 and parse_limit("5/10s").burst == 5
+    with pytest.raises(ValueError):
+        parse_limit("lots")
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path, clock: MemoryStore(clock=clock),
+    lambda tmp_path, clock: SQLiteStore(str(tmp_path / "rl.db"), clock=clock),
+])
+def test_bucket_refills(tmp_path, make_store):
+    clock = Clock()
+    store = make_store(tmp_path, clock)
+    limit = parse_limit("1/second burst 3")
+    assert [store.take("k", limit)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, _, retry_after = store.take("k", limit)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    clock.now += 1.5
+    assert store.take("k", limit)[0]
+    assert store.take("other", limit)[0]  # buckets are per key
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "rl.db")
+    a, b = SQLiteStore(path, clock=clock), SQLiteStore(path, clock=clock)
+    limit = parse_limit("1/minute burst 2")
+    assert a.take("k", limit)[0] and b.take("k", limit)[0]
+    assert not a.take("k", limit)[0]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "RATE_LIMITS", {**app.config["RATE_LIMITS"],
+                                                    "toggle": "1/minute burst 2", "search": "1/minute burst 1"})
+    monkeypatch.setattr(app_module, "_rate_limiter", None)
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'c@example.com', 'x', 'C', 'customer')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Tacos', 1)")
+        db.commit()
+    return app.test_client()
+
+
+def test_routes_return_429_with_retry_after(client):
+    assert client.get("/api/vendors").status_code == 200
+    resp = client.get("/api/vendors")
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    statuses = [client.post("/api/vendors/7/like").status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert app_module.get_rate_limiter().rejected == {"search": 1, "toggle": 1}
@@ -0,0 +1,105 @@
+import os
+import signal
+import socket
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from server import PooledWSGIServer, serve
+
+
+def pid_app(environ, start_response):
+    time.sleep(float(environ.get("QUERY_STRING") or 0))
+    body = str(os.getpid()).encode()
+    start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))])
+    return [body]
+
+
+def fetch(port, delay=0):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/?{delay}", timeout=10) as resp:
+        return int(resp.read())
+
+
+def test_drain_waits_for_in_flight_requests():
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_app(environ, start_response):
+        entered.set()
+        release.wait(5)
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "4")])
+        return [b"done"]
+
+    server = PooledWSGIServer("127.0.0.1", 0, slow_app, threads=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    result = []
+    client = threading.Thread(target=lambda: result.append(
+        urllib.request.urlopen(f"http://127.0.0.1:{server.port}/", timeout=10).read()))
+    client.start()
+    assert entered.wait(5)
+
+    server.shutdown()  # stop accepting, as a worker does on SIGTERM
+    threading.Timer(0.3, release.set).start()
+    started = time.monotonic()
+    server.drain(5)
+    assert time.monotonic() - started >= 0.2
+    client.join(5)
+    assert result == [b"done"]
+    server.server_close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork server needs fork()")
+def test_sighup_replaces_workers_without_refusing_connections():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    master = os.fork()
+    if master == 0:
+        code = 0
+        try:
+            serve(pid_app, port=port, workers=2, threads=4, graceful_timeout=5)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                fetch(port)
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "server did not start"
+                time.sleep(0.05)
+        old = {fetch(port) for _ in range(20)}
+
+        errors, seen, stop = [], set(), threading.Event()
+
+        def hammer():
+            while not stop.is_set():
+                try:
+                    seen.add(fetch(port, 0.02))
+                except OSError as e:
+                    errors.append(e)
+
+        clients = [threading.Thread(target=hammer) for _ in range(4)]
+        for t in clients:
+            t.start()
+        time.sleep(0.2)
+        os.kill(master, signal.SIGHUP)
+        deadline = time.monotonic() + 10
+        while not (seen - old) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)  # keep going while the old generation drains and exits
+        stop.set()
+        for t in clients:
+            t.join(10)
+
+        assert errors == []
+        new = {fetch(port) for _ in range(20)}
+        assert new and not new & old
+    finally:
+        os.kill(master, signal.SIGTERM)
+        os.waitpid(master, 0)
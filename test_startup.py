@@ -0,0 +1,15 @@
+import os
+
+from profile_startup import import_profile, import_seconds
+
+# Seconds allowed for a cold `import app`; override on slow machines
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", 1.0))
+
+
+def test_app_import_within_budget():
+    assert import_seconds("app") < IMPORT_TIME_BUDGET
+
+
+def test_optional_integrations_are_not_imported_at_startup():
+    imported = {name for name, _, _ in import_profile("app")}
+    assert not imported & {"openai", "requests", "aiohttp"}
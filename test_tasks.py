@@ -0,0 +1,135 @@
+import io
+import sqlite3
+import time
+
+import pytest
+
+import app as app_module
+from tasks import DONE, FAILED, QUEUED, SCHEMA, Worker, enqueue, queue_stats
+
+
+@pytest.fixture
+def connect(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.close()
+    return lambda: sqlite3.connect(path, timeout=5)
+
+
+def status_of(connect, task_id):
+    db = connect()
+    try:
+        return db.execute("SELECT status, attempts, run_at, last_error FROM tasks WHERE id=?", (task_id,)).fetchone()
+    finally:
+        db.close()
+
+
+def test_enqueue_joins_caller_transaction_and_dedupes(connect):
+    db = connect()
+    enqueue(db, "noop")
+    db.rollback()
+    first = enqueue(db, "noop", {"n": 1}, idempotency_key="k")
+    assert enqueue(db, "noop", {"n": 2}, idempotency_key="k") == first
+    db.commit()
+    assert db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 1
+
+
+def test_priority_order_and_delay(connect):
+    ran = []
+    db = connect()
+    enqueue(db, "t", {"n": "low"})
+    enqueue(db, "t", {"n": "high"}, priority=10)
+    enqueue(db, "t", {"n": "later"}, priority=99, delay=60)
+    db.commit()
+    worker = Worker(connect, {"t": lambda p: ran.append(p["n"])})
+    assert worker.drain() == 2
+    assert ran == ["high", "low"]
+
+
+def test_failures_retry_with_backoff_then_stay_failed(connect):
+    db = connect()
+    task_id = enqueue(db, "flaky", max_attempts=2)
+    db.commit()
+    worker = Worker(connect, {"flaky": lambda p: 1 / 0}, retry_base=10)
+
+    assert worker.drain() == 1
+    status, attempts, run_at, error = status_of(connect, task_id)
+    assert (status, attempts) == (QUEUED, 1) and "ZeroDivisionError" in error
+    assert 5 <= run_at - time.time() <= 10
+
+    db.execute("UPDATE tasks SET run_at = 0 WHERE id=?", (task_id,))
+    db.commit()
+    assert worker.drain() == 1
+    assert status_of(connect, task_id)[:2] == (FAILED, 2)
+
+
+def test_expired_lease_is_reclaimed(connect):
+    db = connect()
+    task_id = enqueue(db, "t")
+    db.commit()
+    dead = Worker(connect, {}, lease=0.05)
+    assert dead.claim()[0] == task_id  # claimed, then the worker "dies"
+    assert Worker(connect, {"t": lambda p: None}).drain() == 0
+
+    time.sleep(0.1)
+    worker = Worker(connect, {"t": lambda p: None})
+    assert worker.drain() == 1
+    assert status_of(connect, task_id)[:2] == (DONE, 2)
+    stats = queue_stats(connect())
+    assert stats["depth"] == [] and stats["recent"][0]["name"] == "t"
+
+
+def test_expired_lease_counts_as_an_attempt(connect):
+    db = connect()
+    task_id = enqueue(db, "crashes", max_attempts=2)
+    db.commit()
+    for _ in range(2):
+        worker = Worker(connect, {}, lease=0.01)
+        assert worker.claim()[0] == task_id  # the worker dies mid-task every time
+        time.sleep(0.02)
+        worker.reclaim_expired()
+
+    status, attempts, _, error = status_of(connect, task_id)
+    assert (status, attempts, error) == (FAILED, 2, "lease expired")
+    assert Worker(connect, {}).claim() is None
+
+
+def test_worker_starts_without_os_uname(connect, monkeypatch):
+    monkeypatch.delattr("os.uname", raising=False)  # as on Windows
+    assert Worker(connect, {}).owner.count(":") == 2
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'v@example.com', 'x', 'V', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 1, 'Tacos', 1)")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    return client
+
+
+def test_replaced_reel_is_deleted_by_worker(client, tmp_path):
+    def upload(name):
+        return client.post("/api/vendors/7/reel", data={"video": (io.BytesIO(b"video"), name)},
+                           content_type="multipart/form-data").get_json()["video_url"]
+
+    old = tmp_path / upload("one.mp4").rsplit("/", 1)[-1]
+    time.sleep(1)  # reel file names carry a timestamp in seconds
+    upload("two.mp4")
+    assert old.exists()  # the request only queued the cleanup
+
+    metrics = client.get("/metrics").get_data(as_text=True)
+    assert 'task_queue_depth{name="cleanup_file",status="queued"} 1' in metrics
+    assert app_module.make_task_worker().drain() == 1
+    assert not old.exists()
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+import app as app_module
+import tracing
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setitem(app.config, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(app_module, "_event_log", None)
+    monkeypatch.setattr(app_module, "_trace_exporter", None)
+    monkeypatch.setattr(app_module, "_ad_inventory", None)
+    app_module.init_db()
+    yield app.test_client()
+    if app_module._event_log is not None:
+        app_module._event_log.close()
+
+
+def test_sampled_request_exports_nested_spans(client, tmp_path):
+    resp = client.get("/", headers={"X-Request-ID": "req-42"})
+    assert resp.status_code == 200
+    assert resp.headers["X-Request-ID"] == "req-42"
+    app_module.get_event_log().flush()
+
+    spans = tracing.read_traces(str(tmp_path / "logs" / "traces.jsonl"))[tracing.trace_id_for("req-42")]
+    root = next(s for s in spans if "parentSpanId" not in s)
+    assert root["name"] == "GET /"
+    render = next(s for s in spans if s["name"] == "render_template")
+    assert render["parentSpanId"] == root["spanId"]
+    sql = [s for s in spans if s["name"] == app_module.get_database().dialect.name]
+    assert sql and all(int(s["endTimeUnixNano"]) >= int(s["startTimeUnixNano"]) for s in sql)
+    assert "render_template index.html" in tracing.waterfall(spans)
+
+
+def test_unsampled_requests_still_get_a_request_id(client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "TRACE_SAMPLE_RATE", 0)
+    resp = client.get("/api/reels")
+    assert len(resp.headers["X-Request-ID"]) == 32
+
+
+def test_otlp_exporter_posts_to_collector(client, tmp_path, monkeypatch):
+    out = tmp_path / "collected.jsonl"
+    collector = tracing.make_collector("127.0.0.1", 0, str(out))
+    threading.Thread(target=collector.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setitem(app_module.app.config, "TRACE_EXPORT", "otlp")
+        monkeypatch.setitem(app_module.app.config, "TRACE_OTLP_ENDPOINT",
+                            f"http://127.0.0.1:{collector.server_port}/v1/traces")
+        client.get("/api/reels", headers={"X-Request-ID": "otlp-1"})
+        app_module.get_trace_exporter().flush()
+    finally:
+        collector.shutdown()
+    spans = tracing.read_traces(str(out))[tracing.trace_id_for("otlp-1")]
+    assert {s["name"] for s in spans} >= {"GET /api/reels", app_module.get_database().dialect.name}
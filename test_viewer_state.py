@@ -0,0 +1,62 @@
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, backend):
+    app = app_module.app
+    monkeypatch.setitem(app.config, "DATABASE", str(tmp_path / "test.db"))
+    monkeypatch.setitem(app.config, "TESTING", True)
+    monkeypatch.setitem(app.config, "VIEWER_STATE_TTL", 60)
+    monkeypatch.setattr(app_module, "_viewer_state_cache", app_module.OrderedDict())
+    monkeypatch.setattr(app_module, "_viewer_state_generation", {})
+    app_module.init_db()
+    with app.app_context():
+        db = app_module.get_db()
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (1, 'c@example.com', 'x', 'C', 'customer')")
+        db.execute("INSERT INTO users (id, email, password_hash, name, role) VALUES (2, 'v@example.com', 'x', 'V', 'vendor')")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (7, 2, 'Val Tacos', 1)")
+        db.execute("INSERT INTO vendors (id, owner_user_id, name, is_active) VALUES (8, 2, 'Val Burritos', 1)")
+        db.execute("INSERT INTO vendor_likes (user_id, vendor_id) VALUES (1, 7)")
+        db.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    return client
+
+
+def test_viewer_ids_are_cached_until_a_toggle(client):
+    with app_module.app.test_request_context():
+        assert list(app_module.get_viewer_ids("vendor_likes", 1)) == [7]
+    db = app_module.get_database().connect()
+    db.execute("INSERT INTO vendor_likes (user_id, vendor_id) VALUES (1, 8)")
+    db.commit()
+    with app_module.app.test_request_context():
+        assert list(app_module.get_viewer_ids("vendor_likes", 1)) == [7]  # cached
+        app_module.invalidate_viewer_ids("vendor_likes", 1)
+        assert list(app_module.get_viewer_ids("vendor_likes", 1)) == [7, 8]
+
+
+def test_fill_racing_a_toggle_is_not_cached(client, monkeypatch):
+    original = app_module.get_read_db
+
+    class ToggleDuringRead:
+        """The read sees the old rows, then a toggle commits and invalidates before the fill is stored."""
+        def __init__(self, db):
+            self.db = db
+
+        def execute(self, *args):
+            cursor = self.db.execute(*args)
+            rows = cursor.fetchall()
+            app_module.invalidate_viewer_ids("vendor_likes", 1)
+            return type("Rows", (), {"fetchall": lambda self: rows})()
+
+    with app_module.app.test_request_context():
+        monkeypatch.setattr(app_module, "get_read_db", lambda: ToggleDuringRead(original()))
+        assert list(app_module.get_viewer_ids("vendor_likes", 1)) == [7]
+        assert ("vendor_likes", 1) not in app_module._viewer_state_cache
+        monkeypatch.setattr(app_module, "get_read_db", original)
+        app_module.get_viewer_ids("vendor_likes", 1)
+        assert ("vendor_likes", 1) in app_module._viewer_state_cache
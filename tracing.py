@@ -0,0 +1,319 @@
+"""
+Minimal request tracing.
+
+A Trace holds the spans of one sampled request: the request itself, SQL
+statements, template renders, file saves and outbound HTTP calls, nested by
+whatever span was open when each started. Finished traces are encoded as
+OTLP/JSON (the body an OpenTelemetry collector accepts on /v1/traces) and
+handed to an exporter:
+
+    FileExporter   one OTLP/JSON document per line in a local file
+    OtlpExporter   batched POSTs to an OTLP/HTTP endpoint
+
+For local use this module doubles as a stand-in collector and viewer:
+
+    python tracing.py collect --port 4318 --out traces.jsonl
+    python tracing.py show traces.jsonl [--request-id ID]
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+SERVICE_NAME = "deliciousroute"
+_HEX32 = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _span_id():
+    return os.urandom(8).hex()
+
+
+def trace_id_for(request_id):
+    """Request ids that are already 32 hex chars are used as-is, others are hashed."""
+    if _HEX32.match(request_id):
+        return request_id
+    return hashlib.md5(request_id.encode()).hexdigest()
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, parent_id, attributes):
+        self.name = name
+        self.span_id = _span_id()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+
+    def finish(self):
+        # May be called again (e.g. SQL fetches) to extend the span
+        self.end_ns = time.time_ns()
+
+
+class Trace:
+    def __init__(self, request_id, name, **attributes):
+        self.request_id = request_id
+        self.trace_id = trace_id_for(request_id)
+        self.spans = []
+        self._stack = []
+        self.root = self.start(name, **attributes, **{"http.request_id": request_id})
+
+    def start(self, name, **attributes):
+        """Open a span as a child of the innermost open span and make it current."""
+        span = self.leaf(name, **attributes)
+        self._stack.append(span)
+        return span
+
+    def end(self, span):
+        span.finish()
+        if span in self._stack:
+            # Also closes children that were never ended explicitly
+            del self._stack[self._stack.index(span):]
+
+    def leaf(self, name, **attributes):
+        """A span that never becomes current (SQL statements, single calls)."""
+        span = Span(name, self._stack[-1].span_id if self._stack else None, attributes)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self.start(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            self.end(span)
+
+    def finish(self):
+        for span in self.spans:
+            if span.end_ns is None:
+                span.finish()
+        return self
+
+    def to_otlp(self):
+        return {"resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{
+                "scope": {"name": SERVICE_NAME},
+                "spans": [_otlp_span(self.trace_id, s) for s in self.spans],
+            }],
+        }]}
+
+
+def _value(v):
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _attributes(attrs):
+    return [{"key": k, "value": _value(v)} for k, v in attrs.items() if v is not None]
+
+
+def _otlp_span(trace_id, span):
+    out = {
+        "traceId": trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 2 if span.parent_id is None else 1,  # SERVER for the request, INTERNAL otherwise
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _attributes(span.attributes),
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id:
+        out["parentSpanId"] = span.parent_id
+    return out
+
+
+# ------------------------------------------------------------------------------
+# Exporters
+# ------------------------------------------------------------------------------
+class FileExporter:
+    """Appends each trace as one OTLP/JSON line through an AsyncJsonLog."""
+
+    def __init__(self, log, stream="traces"):
+        self.log = log
+        self.stream = stream
+
+    def export(self, trace):
+        self.log.emit(self.stream, trace.to_otlp())
+
+
+class OtlpExporter:
+    """Batches traces on a background thread and POSTs them as OTLP/JSON."""
+
+    def __init__(self, endpoint, timeout=2.0, queue_size=1000, batch_size=64, flush_interval=1.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                    threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+                    self._pid = os.getpid()
+        try:
+            self._queue.put_nowait(trace.to_otlp())
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        import urllib.request
+
+        q = self._queue
+        while True:
+            try:
+                batch = [q.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            body = {"resourceSpans": [rs for doc in batch for rs in doc["resourceSpans"]]}
+            req = urllib.request.Request(self.endpoint, data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json"})
+            try:
+                urllib.request.urlopen(req, timeout=self.timeout).read()
+            except OSError:
+                self.dropped += len(batch)
+            for _ in batch:
+                q.task_done()
+
+    def flush(self):
+        if self._pid == os.getpid():
+            self._queue.join()
+
+
+# ------------------------------------------------------------------------------
+# Stand-in collector and waterfall viewer
+# ------------------------------------------------------------------------------
+def make_collector(host, port, out_path):
+    """HTTP server accepting OTLP/JSON on /v1/traces and appending it to `out_path`."""
+    import http.server
+
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock, open(out_path, "a") as fh:
+                fh.write(json.dumps(body, separators=(",", ":")) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    return http.server.ThreadingHTTPServer((host, port), Handler)
+
+
+def read_traces(path):
+    """trace id -> list of OTLP span dicts, from a file of OTLP/JSON lines."""
+    traces = {}
+    with open(path) as fh:
+        for line in fh:
+            try:
+                doc = json.loads(line)
+            except ValueError:
+                continue
+            for rs in doc.get("resourceSpans", []):
+                for ss in rs.get("scopeSpans", []):
+                    for span in ss.get("spans", []):
+                        traces.setdefault(span["traceId"], []).append(span)
+    return traces
+
+
+def _attr(span, key):
+    for a in span.get("attributes", []):
+        if a["key"] == key:
+            return next(iter(a["value"].values()))
+    return None
+
+
+def waterfall(spans):
+    """Text waterfall of one trace: offset, duration and nesting per span."""
+    by_parent = {}
+    for s in spans:
+        by_parent.setdefault(s.get("parentSpanId"), []).append(s)
+    roots = by_parent.get(None, [])
+    if not roots:
+        return ""
+    t0 = min(int(s["startTimeUnixNano"]) for s in spans)
+    lines = []
+
+    def walk(span, depth):
+        start = (int(span["startTimeUnixNano"]) - t0) / 1e6
+        dur = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        detail = _attr(span, "db.statement") or _attr(span, "http.url") or _attr(span, "template") \
+            or _attr(span, "file") or _attr(span, "http.route") or ""
+        lines.append(f"{start:9.2f} {dur:9.2f}ms  {'  ' * depth}{span['name']} {detail}".rstrip())
+        for child in sorted(by_parent.get(span["spanId"], []), key=lambda s: int(s["startTimeUnixNano"])):
+            walk(child, depth + 1)
+
+    for root in roots:
+        lines.append(f"trace {root['traceId']} request_id={_attr(root, 'http.request_id')}")
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trace collector stand-in and viewer.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    collect = sub.add_parser("collect", help="accept OTLP/JSON on /v1/traces")
+    collect.add_argument("--host", default="127.0.0.1")
+    collect.add_argument("--port", type=int, default=4318)
+    collect.add_argument("--out", default="traces.jsonl")
+    show = sub.add_parser("show", help="print waterfalls from a traces file")
+    show.add_argument("path")
+    show.add_argument("--request-id", help="only the trace for this X-Request-ID")
+    show.add_argument("--last", type=int, default=5, help="number of most recent traces")
+    args = parser.parse_args()
+
+    if args.command == "collect":
+        server = make_collector(args.host, args.port, args.out)
+        print(f"collecting OTLP/JSON on http://{args.host}:{server.server_port}/v1/traces -> {args.out}")
+        server.serve_forever()
+        return
+
+    traces = read_traces(args.path)
+    if args.request_id:
+        wanted = trace_id_for(args.request_id)
+        traces = {k: v for k, v in traces.items() if k == wanted}
+    for spans in list(traces.values())[-args.last:]:
+        print(waterfall(spans))
+        print()
+
+
+if __name__ == "__main__":
+    main()